@@ -0,0 +1,123 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import degrees
+from util import SearchStats
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Answer many degrees-of-separation queries at once. "
+                    "Each input line holds a source and a target, "
+                    "as names or IMDB ids, separated by a tab."
+    )
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("queries", nargs="?", default="-",
+                        help="file of queries, or - for stdin")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="number of worker processes")
+    parser.add_argument("--compact", action="store_true",
+                        help="load into a compact integer-indexed graph")
+    parser.add_argument("--snapshot", action="store_true",
+                        help="load the compact graph from a cached snapshot")
+    args = parser.parse_args()
+
+    # Load once in the parent; forked workers share it copy-on-write
+    degrees.load_data(args.directory, compact=args.compact,
+                      snapshot=args.snapshot)
+
+    if args.queries == "-":
+        f = sys.stdin
+    else:
+        f = open(args.queries, encoding="utf-8")
+
+    latencies = []
+    start = time.perf_counter()
+    context = multiprocessing.get_context("fork")
+    with f, context.Pool(args.workers) as pool:
+        # imap keeps input order while workers run ahead
+        for result in pool.imap(answer, read_queries(f), chunksize=16):
+            latencies.append(result["latency_ms"])
+            print(json.dumps(result), flush=True)
+    elapsed = time.perf_counter() - start
+
+    report(latencies, elapsed)
+
+
+def read_queries(lines):
+    """
+    Yields (line number, source, target) for each non-blank line.
+    """
+    for number, line in enumerate(lines, 1):
+        line = line.rstrip("\n")
+        if line.strip():
+            source, _, target = line.partition("\t")
+            yield number, source.strip(), target.strip()
+
+
+def answer(query):
+    """
+    Answers one query, returning a JSON-ready result.
+    """
+    number, source, target = query
+    start = time.perf_counter()
+    result = {"line": number, "source": source, "target": target}
+
+    source_id, error = resolve(source)
+    if error is None:
+        target_id, error = resolve(target)
+    if error is None:
+        stats = SearchStats()
+        path = degrees.bidirectional_shortest_path(source_id, target_id,
+                                                   stats)
+        result["source_id"] = source_id
+        result["target_id"] = target_id
+        result["degrees"] = None if path is None else len(path)
+        result["path"] = path
+        result["stats"] = stats.as_dict()
+    else:
+        result["error"] = error
+
+    result["latency_ms"] = (time.perf_counter() - start) * 1000
+    return result
+
+
+def resolve(person):
+    """
+    Returns (person_id, None) for an IMDB id or an unambiguous name,
+    or (None, error) describing why it could not be resolved.
+    """
+    if degrees.is_person_id(person):
+        return person, None
+    person_ids = degrees.person_ids_for_name(person)
+    if len(person_ids) == 1:
+        return person_ids[0], None
+    if not person_ids:
+        return None, {"person": person, "reason": "not found",
+                      "suggestions": degrees.suggest_person_ids(person)}
+    return None, {"person": person, "reason": "ambiguous", "ids": person_ids}
+
+
+def report(latencies, elapsed):
+    """
+    Prints latency percentiles and overall throughput to stderr.
+    """
+    if not latencies:
+        print("No queries.", file=sys.stderr)
+        return
+    ordered = sorted(latencies)
+    print(f"{len(latencies)} queries in {elapsed:.3f}s "
+          f"({len(latencies) / elapsed:.1f} queries/s)", file=sys.stderr)
+    for percentile in (50, 90, 99):
+        latency = ordered[min(len(ordered) - 1,
+                              len(ordered) * percentile // 100)]
+        print(f"  p{percentile}: {latency:.3f}ms", file=sys.stderr)
+    print(f"  max: {ordered[-1]:.3f}ms", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+import argparse
+import csv
+import datetime
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import time
+
+import degrees
+from landmarks import load_landmarks
+from util import SearchStats
+
+FIRST_NAMES = [
+    "James", "Mary", "John", "Patricia", "Robert", "Jennifer", "Michael",
+    "Linda", "William", "Elizabeth", "David", "Barbara", "Richard", "Susan",
+    "Joseph", "Jessica", "Thomas", "Sarah", "Charles", "Karen", "Daniel",
+    "Nancy", "Matthew", "Lisa", "Anthony", "Betty", "Mark", "Margaret",
+    "Steven", "Sandra", "Paul", "Ashley", "Andrew", "Emily", "Kenneth",
+    "Donna", "Kevin", "Michelle", "Brian", "Carol", "George", "Amanda",
+]
+LAST_NAMES = [
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller",
+    "Davis", "Rodriguez", "Martinez", "Hernandez", "Lopez", "Gonzalez",
+    "Wilson", "Anderson", "Thomas", "Taylor", "Moore", "Jackson", "Martin",
+    "Lee", "Perez", "Thompson", "White", "Harris", "Sanchez", "Clark",
+    "Ramirez", "Lewis", "Robinson", "Walker", "Young", "Allen", "King",
+    "Wright", "Scott", "Torres", "Nguyen", "Hill", "Flores", "Green",
+]
+WORDS = [
+    "Night", "Return", "Last", "City", "Love", "Dark", "Star", "River",
+    "King", "Shadow", "Summer", "Blood", "House", "Road", "Secret", "Fire",
+    "Island", "Heart", "Storm", "Silent", "Golden", "Wild", "Lost", "Time",
+]
+
+SEARCHES = {
+    "bfs": degrees.shortest_path,
+    "bidirectional": degrees.bidirectional_shortest_path,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate synthetic degrees datasets and benchmark "
+                    "loading and searching them."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate = commands.add_parser(
+        "generate", help="write people, movies and stars CSVs"
+    )
+    generate.add_argument("directory")
+    generate.add_argument("--stars", type=int, default=100000,
+                          help="number of rows in stars.csv")
+    generate.add_argument("--people", type=int,
+                          help="number of people (default: stars / 3)")
+    generate.add_argument("--alpha", type=float, default=1.5,
+                          help="power-law exponent of cast sizes")
+    generate.add_argument("--max-cast", type=int, default=500,
+                          help="largest cast any movie can have")
+    generate.add_argument("--seed", type=int, default=0)
+
+    run = commands.add_parser(
+        "run", help="time loading a dataset and answering random queries"
+    )
+    run.add_argument("directory")
+    run.add_argument("--queries", type=int, default=200,
+                     help="number of random source and target pairs")
+    run.add_argument("--search", choices=["bfs", "bidirectional", "alt"],
+                     default="bidirectional")
+    run.add_argument("--compact", action="store_true",
+                     help="load into a compact integer-indexed graph")
+    run.add_argument("--snapshot", action="store_true",
+                     help="load the compact graph from a cached snapshot")
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--label", help="name for this run in the results")
+    run.add_argument("--output", help="write the results to this JSON file")
+
+    compare = commands.add_parser(
+        "compare", help="compare the results of two runs"
+    )
+    compare.add_argument("baseline")
+    compare.add_argument("candidate")
+
+    args = parser.parse_args()
+    if args.command == "generate":
+        counts = generate_dataset(args.directory, args.stars, args.people,
+                                  args.alpha, args.max_cast, args.seed)
+        print(f"Wrote {counts['people']} people, {counts['movies']} movies "
+              f"and {counts['stars']} stars to {args.directory}.")
+    elif args.command == "run":
+        results = run_benchmark(args)
+        print(json.dumps(results, indent=2))
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2)
+                f.write("\n")
+    else:
+        compare_results(args.baseline, args.candidate)
+
+
+def generate_dataset(directory, stars, people=None, alpha=1.5, max_cast=500,
+                     seed=0):
+    """
+    Writes a synthetic dataset of about `stars` star rows to `directory`,
+    in the same CSV layout as `small` and `large`.
+
+    Cast sizes follow a power law with exponent `alpha`, so most movies
+    have a handful of stars and a few have hundreds. Who gets cast is
+    skewed the same way, giving a few prolific people and a long tail
+    of one-film careers, as in the real IMDB data.
+
+    Returns the number of people, movies and stars written.
+    """
+    rng = random.Random(seed)
+    people = people or max(stars // 3, 2)
+    max_cast = min(max_cast, people)
+    os.makedirs(directory, exist_ok=True)
+
+    # Ids are spread out and shuffled, so nothing can rely on them being
+    # dense or in order
+    person_ids = rng.sample(range(1, 10 * people), people)
+    with open(os.path.join(directory, "people.csv"), "w",
+              encoding="utf-8", newline="") as f:
+        writer = csv.writer(f, quoting=csv.QUOTE_NONNUMERIC)
+        writer.writerow(["id", "name", "birth"])
+        for person_id in person_ids:
+            writer.writerow([
+                person_id,
+                f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                rng.randint(1900, 2010),
+            ])
+
+    movies = 0
+    written = 0
+    with open(os.path.join(directory, "movies.csv"), "w",
+              encoding="utf-8", newline="") as movies_file, \
+            open(os.path.join(directory, "stars.csv"), "w",
+                 encoding="utf-8", newline="") as stars_file:
+        movie_writer = csv.writer(movies_file, quoting=csv.QUOTE_NONNUMERIC)
+        star_writer = csv.writer(stars_file)
+        movie_writer.writerow(["id", "title", "year"])
+        star_writer.writerow(["person_id", "movie_id"])
+
+        while written < stars:
+            movies += 1
+            movie_id = 100000 + movies
+            movie_writer.writerow([
+                movie_id,
+                " ".join(rng.sample(WORDS, rng.randint(1, 3))),
+                rng.randint(1920, 2020),
+            ])
+
+            size = min(int(rng.paretovariate(alpha)), max_cast,
+                       stars - written)
+            cast = set()
+            while len(cast) < size:
+                # The square of a uniform draw favours low indexes,
+                # making the early people the prolific ones
+                cast.add(person_ids[int(people * rng.random() ** 2)])
+            for person_id in cast:
+                star_writer.writerow([person_id, movie_id])
+            written += size
+
+    return {"people": people, "movies": movies, "stars": written}
+
+
+def run_benchmark(args):
+    """
+    Loads `args.directory` as the other tools would and searches between
+    random pairs of people, returning the timings as a JSON-ready dict.
+    """
+    start = time.perf_counter()
+    degrees.load_data(args.directory, compact=args.compact,
+                      snapshot=args.snapshot)
+    load_time = time.perf_counter() - start
+
+    index = None
+    if args.search == "alt":
+        index = load_landmarks(args.directory, degrees.person_count(),
+                               degrees.deltas_applied)
+        if index is None:
+            sys.exit("No landmarks for this dataset; "
+                     "run landmarks.py on it first.")
+
+    if degrees.graph is not None:
+        person_ids = degrees.graph.person_ids
+    else:
+        person_ids = list(degrees.people)
+    rng = random.Random(args.seed)
+    pairs = [
+        (rng.choice(person_ids), rng.choice(person_ids))
+        for _ in range(args.queries)
+    ]
+
+    neighbor_latencies = []
+    for source, _ in pairs:
+        start = time.perf_counter()
+        degrees.neighbors_for_person(source)
+        neighbor_latencies.append((time.perf_counter() - start) * 1000)
+
+    latencies = []
+    expanded = []
+    found = 0
+    for source, target in pairs:
+        stats = SearchStats()
+        start = time.perf_counter()
+        if index is not None:
+            path = degrees.alt_shortest_path(source, target, index, stats)
+        else:
+            path = SEARCHES[args.search](source, target, stats)
+        latencies.append((time.perf_counter() - start) * 1000)
+        expanded.append(stats.nodes_expanded)
+        found += path is not None
+
+    return {
+        "label": args.label,
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "directory": args.directory,
+        "mode": ("snapshot" if args.snapshot
+                 else "compact" if args.compact else "dict"),
+        "search": args.search,
+        "people": len(person_ids),
+        "queries": len(pairs),
+        "seed": args.seed,
+        "load_s": load_time,
+        "peak_rss_mb": peak_rss() / 2 ** 20,
+        "neighbors_ms": percentiles(neighbor_latencies),
+        "query_ms": percentiles(latencies),
+        "nodes_expanded": percentiles(expanded),
+        "connected": found / len(pairs) if pairs else None,
+    }
+
+
+# Each project runs on its own from its directory, so this and
+# peak_rss are kept in step with the copies in pagerank/benchmark.py
+# rather than shared.
+def percentiles(values):
+    """
+    Returns the mean, median, 90th and 99th percentiles and maximum of
+    `values`.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    result = {"mean": sum(ordered) / len(ordered)}
+    for percentile in (50, 90, 99):
+        result[f"p{percentile}"] = ordered[
+            min(len(ordered) - 1, len(ordered) * percentile // 100)
+        ]
+    result["max"] = ordered[-1]
+    return result
+
+
+def peak_rss():
+    """
+    Returns the most memory this process has held at once, in bytes.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def compare_results(baseline, candidate):
+    """
+    Prints how each timing in the `candidate` results file changed
+    relative to the `baseline` one.
+    """
+    with open(baseline, encoding="utf-8") as f:
+        before = json.load(f)
+    with open(candidate, encoding="utf-8") as f:
+        after = json.load(f)
+
+    rows = [("load_s", before["load_s"], after["load_s"]),
+            ("peak_rss_mb", before["peak_rss_mb"], after["peak_rss_mb"])]
+    for metric in ("neighbors_ms", "query_ms", "nodes_expanded"):
+        for key in ("p50", "p90", "p99"):
+            if before.get(metric) and after.get(metric):
+                rows.append((f"{metric} {key}", before[metric][key],
+                             after[metric][key]))
+
+    print(f"{'':24}{before.get('label') or baseline:>14}"
+          f"{after.get('label') or candidate:>14}")
+    for name, old, new in rows:
+        change = f"{(new - old) / old:+.1%}" if old else ""
+        print(f"{name:24}{old:14.3f}{new:14.3f}  {change}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,71 @@
+import argparse
 import csv
+import functools
+import heapq
+import itertools
+import math
+import os
 import sys
 
-from util import Node, StackFrontier, QueueFrontier
+from graph import CompactGraph, NameIndex, SortedIndex
+from landmarks import FILENAME as LANDMARKS, load_landmarks, save_landmarks
+from snapshot import load_snapshot, save_snapshot, record_delta, \
+    recorded_deltas
+from util import Node, StackFrontier, QueueFrontier, SearchStats
 
 # Maps names to a set of corresponding person_ids
 names = {}
 
+# Prefix and typo-tolerant index over the keys of `names`
+name_search = None
+
 # Maps person_ids to a dictionary of: name, birth, movies (a set of movie_ids)
 people = {}
 
 # Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
 movies = {}
 
+# Maps person_ids to their row in people.csv, filled in on first use by
+# searches that read per-person tables such as landmark distances
+rows = {}
+
+# Compact integer-indexed form of the data, used instead of the
+# dictionaries above when loaded with `compact=True` or `snapshot=True`
+graph = None
+
+# Number of deltas added by `update_data` or replayed from the snapshot
+# journal since the data was loaded, so files derived from the data,
+# such as landmark distances, can tell which version they belong to
+deltas_applied = 0
+
 
-def load_data(directory):
+def load_data(directory, compact=False, snapshot=False):
     """
     Load data from CSV files into memory.
+
+    With `compact`, build a CompactGraph instead of the dictionaries.
+    With `snapshot`, memory-map the compact graph from the directory's
+    snapshot, first writing one if it is missing or older than the CSVs,
+    then apply any deltas recorded against it by `update_data`.
     """
+    global graph, name_search, deltas_applied
+    deltas_applied = 0
+    if snapshot:
+        graph = load_snapshot(directory)
+        if graph is None:
+            graph = CompactGraph.from_csv(directory)
+            try:
+                save_snapshot(graph, directory)
+            except OSError:
+                # A read-only dataset still loads, just without the cache
+                pass
+        for tables in recorded_deltas(directory):
+            apply_delta(tables)
+        return
+    if compact:
+        graph = CompactGraph.from_csv(directory)
+        return
+
     # Load people
     with open(f"{directory}/people.csv", encoding="utf-8") as f:
         reader = csv.DictReader(f)
@@ -51,15 +100,159 @@ def load_data(directory):
             except KeyError:
                 pass
 
+    name_search = NameIndex(SortedIndex(list(names)))
+
+
+def update_data(delta, directory=None):
+    """
+    Add the people, movies and stars in the CSV files in directory `delta`
+    to the data already loaded, in time proportional to the delta. Any of
+    the three files may be missing, and people or movies that are already
+    loaded are left as they are.
+
+    If `directory` is given, the delta's rows are also recorded in that
+    dataset's snapshot journal so that later snapshot loads replay them,
+    and its landmark file is removed since the new stars may shorten
+    distances.
+
+    Returns the new (person_id, movie_id) stars, so that indexes kept in
+    memory, such as a LandmarkIndex, can be updated with them.
+    """
+    tables = read_delta(delta)
+    stars = apply_delta(tables)
+
+    if directory is not None:
+        record_delta(directory, tables)
+        try:
+            os.remove(os.path.join(directory, LANDMARKS))
+        except FileNotFoundError:
+            pass
+
+    return stars
+
+
+def read_delta(delta):
+    """
+    Returns the rows of each CSV file in directory `delta`, keyed by file
+    name, with no rows for a file that is missing.
+    """
+    tables = {}
+    for filename in ("people.csv", "movies.csv", "stars.csv"):
+        try:
+            f = open(os.path.join(delta, filename), encoding="utf-8")
+        except FileNotFoundError:
+            tables[filename] = []
+            continue
+        with f:
+            tables[filename] = list(csv.DictReader(f))
+    return tables
+
+
+def apply_delta(tables):
+    """
+    Adds the delta rows in `tables`, as read by `read_delta`, to the data
+    already loaded, returning the new (person_id, movie_id) stars.
+    """
+    global deltas_applied
+    deltas_applied += 1
+    if graph is not None:
+        return graph.apply_delta(tables)
+
+    for row in tables["people.csv"]:
+        if row["id"] not in people:
+            people[row["id"]] = {
+                "name": row["name"],
+                "birth": row["birth"],
+                "movies": set()
+            }
+            if row["name"].lower() not in names:
+                name_search.names.keys.append(row["name"].lower())
+                name_search.add(len(name_search.names.keys) - 1)
+            names.setdefault(row["name"].lower(), set()).add(row["id"])
+            if rows:
+                rows[row["id"]] = len(rows)
+
+    for row in tables["movies.csv"]:
+        if row["id"] not in movies:
+            movies[row["id"]] = {
+                "title": row["title"],
+                "year": row["year"],
+                "stars": set()
+            }
+
+    stars = []
+    for row in tables["stars.csv"]:
+        person_id, movie_id = row["person_id"], row["movie_id"]
+        if person_id in people and movie_id in movies:
+            if movie_id not in people[person_id]["movies"]:
+                people[person_id]["movies"].add(movie_id)
+                movies[movie_id]["stars"].add(person_id)
+                stars.append((person_id, movie_id))
+
+    return stars
+
+
+def update_landmarks(index, stars):
+    """
+    Brings the landmark distances in `index` up to date with the
+    (person_id, movie_id) `stars` returned by update_data.
+    """
+    movie_ids = set(movie_id for _, movie_id in stars)
+    if graph is not None:
+        casts = [
+            graph.stars_of(graph.movie_index[movie_id])
+            for movie_id in movie_ids
+        ]
+        index.update(casts, person_count(), lambda person: person,
+                     graph.neighbors)
+    else:
+        casts = [movies[movie_id]["stars"] for movie_id in movie_ids]
+        index.update(casts, person_count(), person_row, neighbors_for_person)
+    index.deltas = deltas_applied
+
 
 def main():
-    if len(sys.argv) > 2:
-        sys.exit("Usage: python degrees.py [directory]")
-    directory = sys.argv[1] if len(sys.argv) == 2 else "large"
+    parser = argparse.ArgumentParser(usage="python degrees.py [directory]")
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--compact", action="store_true",
+                        help="load into a compact integer-indexed graph")
+    parser.add_argument("--snapshot", action="store_true",
+                        help="load the compact graph from a cached snapshot")
+    parser.add_argument("--landmarks", action="store_true",
+                        help="search with A* over landmark distances "
+                             "precomputed by landmarks.py")
+    parser.add_argument("--stats", action="store_true",
+                        help="print how much work the search did")
+    parser.add_argument("--all", type=int, default=0, metavar="K",
+                        help="print up to K shortest paths instead of one")
+    parser.add_argument("--delta", action="append", default=[],
+                        metavar="DIRECTORY",
+                        help="add the people, movies and stars CSVs in "
+                             "DIRECTORY; with --snapshot, keep them for "
+                             "later runs too")
+    args = parser.parse_args()
 
     # Load data from files into memory
     print("Loading data...")
-    load_data(directory)
+    load_data(args.directory, compact=args.compact, snapshot=args.snapshot)
+
+    # Landmark files match the data before this run's deltas, so load
+    # them first and bring them up to date with the deltas afterwards
+    index = None
+    if args.landmarks:
+        index = load_landmarks(args.directory, person_count(), deltas_applied)
+        if index is None:
+            sys.exit("Landmarks missing or out of date; "
+                     "run landmarks.py first.")
+
+    stars = []
+    for delta in args.delta:
+        stars += update_data(delta, args.directory if args.snapshot else None)
+    if index is not None and args.delta:
+        update_landmarks(index, stars)
+        if args.snapshot:
+            # The deltas are kept in the journal, so keep the distances too
+            save_landmarks(index, args.directory, person_count())
     print("Data loaded.")
 
     source = person_id_for_name(input("Name: "))
@@ -69,27 +262,55 @@ def main():
     if target is None:
         sys.exit("Person not found.")
 
-    path = shortest_path(source, target)
+    stats = SearchStats()
+    if args.all:
+        paths = list(all_shortest_paths(source, target, args.all, stats))
+    elif index is None:
+        paths = [bidirectional_shortest_path(source, target, stats)]
+    else:
+        paths = [alt_shortest_path(source, target, index, stats)]
+    if args.stats:
+        for counter, value in stats.as_dict().items():
+            print(f"{counter}: {value:.6g}")
 
-    if path is None:
+    if not paths or paths[0] is None:
         print("Not connected.")
-    else:
-        degrees = len(path)
-        print(f"{degrees} degrees of separation.")
-        path = [(None, source)] + path
-        for i in range(degrees):
-            person1 = people[path[i][1]]["name"]
-            person2 = people[path[i + 1][1]]["name"]
-            movie = movies[path[i + 1][0]]["title"]
-            print(f"{i + 1}: {person1} and {person2} starred in {movie}")
+        return
+    print(f"{len(paths[0])} degrees of separation.")
+    for number, path in enumerate(paths, 1):
+        if len(paths) > 1:
+            print(f"Path {number}:")
+        print_path(source, path)
+
+
+def print_path(source, path):
+    """
+    Prints who starred with whom in each link of `path`.
+    """
+    degrees = len(path)
+    path = [(None, source)] + path
+    for i in range(degrees):
+        person1 = person_name(path[i][1])
+        person2 = person_name(path[i + 1][1])
+        movie = movie_title(path[i + 1][0])
+        print(f"{i + 1}: {person1} and {person2} starred in {movie}")
 
 
-def shortest_path(source, target):
+def shortest_path(source, target, stats=None):
     """
     Returns the shortest list of (movie_id, person_id) pairs
     that connect the source to the target.
 
-    If no possible path, returns None.
+    If no possible path, returns None. Pass a SearchStats as `stats`
+    to read back how much work the search did.
+    """
+    return _run_search(_breadth_first_search, source, target, stats)
+
+
+def _breadth_first_search(source, target, neighbors, stats):
+    """
+    Breadth-first search from source to target, using `neighbors` to
+    list the (movie, person) links out of a person.
     """
 
     # Initialization
@@ -107,11 +328,13 @@ def shortest_path(source, target):
         # add curr node to explored nodes set
         node = frontier.remove()
         checkedPeople.add(node.state)
+        stats.expanded(node.state, len(frontier))
 
         # get list of neighbours
-        for link in neighbors_for_person(node.state):
-            # check if neighbor has been checked
-            if link[1] not in checkedPeople:
+        for link in neighbors(node.state):
+            # check if neighbor has been checked or is already queued
+            if (link[1] not in checkedPeople
+                    and not frontier.contains_state(link[1])):
                 # if neighbour is the target
                 if link[1] == target:
                     links = [(link[0], link[1])]
@@ -125,7 +348,339 @@ def shortest_path(source, target):
                 # add child to frontier after checking if target
                 child = Node(link[1], node, link[0])
                 frontier.add(child)
-                print("added", child.state)
+                stats.enqueued(len(frontier))
+
+
+def bidirectional_shortest_path(source, target, stats=None):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs
+    that connect the source to the target, searching from both
+    ends at once.
+
+    Each round expands one whole BFS layer of whichever frontier is
+    smaller, so the explored sets only grow to about half the path
+    length on each side. If no possible path, returns None.
+    Pass a SearchStats as `stats` to read back how much work the
+    search did.
+    """
+    return _run_search(_bidirectional_search, source, target, stats)
+
+
+def _bidirectional_search(source, target, neighbors, stats):
+    """
+    Bidirectional breadth-first search from source to target, using
+    `neighbors` to list the (movie, person) links out of a person.
+    """
+    if source == target:
+        return []
+
+    # Nodes reached from each end, keyed by person_id. Forward nodes point
+    # back towards the source, backward nodes point on towards the target.
+    forward = {source: Node(source, None, None)}
+    backward = {target: Node(target, None, None)}
+    forwardLayer = [source]
+    backwardLayer = [target]
+
+    while forwardLayer and backwardLayer:
+        expandForward = len(forwardLayer) <= len(backwardLayer)
+        if expandForward:
+            layer, reached, other = forwardLayer, forward, backward
+        else:
+            layer, reached, other = backwardLayer, backward, forward
+
+        otherLayer = backwardLayer if expandForward else forwardLayer
+        best = None
+        nextLayer = []
+        for i, state in enumerate(layer):
+            node = reached[state]
+            # People still waiting on either side, besides the next layer
+            waiting = len(layer) - i - 1 + len(otherLayer)
+            stats.expanded(state, waiting + len(nextLayer))
+            for movie_id, person_id in neighbors(state):
+                if person_id in other:
+                    # Layers are expanded whole, so the shortest meeting
+                    # found in this round is a shortest path overall
+                    length = _depth(node) + _depth(other[person_id]) + 1
+                    if best is None or length < best[0]:
+                        best = (length, node, movie_id, other[person_id])
+                if person_id not in reached:
+                    reached[person_id] = Node(person_id, node, movie_id)
+                    nextLayer.append(person_id)
+                    stats.enqueued(waiting + len(nextLayer))
+
+        if best is not None:
+            _, node, movie_id, meet = best
+            if expandForward:
+                return _join_path(node, movie_id, meet)
+            return _join_path(meet, movie_id, node)
+
+        if expandForward:
+            forwardLayer = nextLayer
+        else:
+            backwardLayer = nextLayer
+
+    return None
+
+
+def alt_shortest_path(source, target, index, stats=None):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs
+    that connect the source to the target, using A* search guided by
+    the landmark distances in `index` (see landmarks.py).
+
+    If no possible path, returns None. Pass a SearchStats as `stats`
+    to read back how much work the search did.
+    """
+    return _run_search(
+        functools.partial(_alt_search, index=index), source, target, stats
+    )
+
+
+def _alt_search(source, target, neighbors, stats, index):
+    """
+    A* search from source to target, using `neighbors` to list the
+    (movie, person) links out of a person and ALT lower bounds from
+    `index` as the heuristic.
+    """
+    row = person_row if graph is None else (lambda person: person)
+    bound = index.bound_to(row(target))
+    if bound(row(source)) == math.inf:
+        return None
+
+    # Frontier entries are (estimated length, -links so far, tiebreak,
+    # node); preferring deeper nodes among equal estimates heads for the
+    # target instead of widening every layer
+    tiebreak = itertools.count()
+    frontier = [(bound(row(source)), 0, next(tiebreak),
+                 Node(source, None, None))]
+    costs = {source: 0}
+
+    while frontier:
+        _, cost, _, node = heapq.heappop(frontier)
+        cost = -cost
+        if node.state == target:
+            return _path_to(node)
+        if cost > costs[node.state]:
+            # Stale entry for a person since reached by a shorter path
+            continue
+        stats.expanded(node.state, len(frontier))
+
+        for movie_id, person_id in neighbors(node.state):
+            if cost + 1 >= costs.get(person_id, math.inf):
+                continue
+            estimate = bound(row(person_id))
+            if estimate == math.inf:
+                continue
+            costs[person_id] = cost + 1
+            child = Node(person_id, node, movie_id)
+            heapq.heappush(frontier, (cost + 1 + estimate, -(cost + 1),
+                                      next(tiebreak), child))
+            stats.enqueued(len(frontier))
+
+    return None
+
+
+def all_shortest_paths(source, target, k=None, stats=None):
+    """
+    Yields every shortest list of (movie_id, person_id) pairs that
+    connects the source to the target, or only the first `k` of them.
+
+    One bidirectional search records every way each person was reached
+    at their shortest depth; paths are then read off those links one at
+    a time, so asking for a few of millions of equally short paths is
+    cheap. Yields nothing if there is no possible path. Pass a
+    SearchStats as `stats` to read back how much work the search did.
+    """
+    if k is not None and k < 1:
+        return
+    if source == target:
+        yield []
+        return
+    found = _run_search(_layered_search, source, target, stats,
+                        translate=False)
+    if found is None:
+        return
+    paths = _shortest_paths(*found)
+    if graph is not None:
+        paths = map(_path_ids, paths)
+    yield from itertools.islice(paths, k)
+
+
+def _layered_search(source, target, neighbors, stats):
+    """
+    Bidirectional breadth-first search from source to target, using
+    `neighbors` to list the (movie, person) links out of a person, that
+    keeps every link a person was reached by at their shortest depth.
+
+    Returns (forward links, meetings, backward links), or None if source
+    and target are not connected. Forward links map each person to the
+    (movie, person) links back towards the source, backward links point
+    on towards the target, and each meeting is a (forward person, movie,
+    backward person) link that completes a shortest path.
+    """
+    forward = {source: []}
+    backward = {target: []}
+    forwardDepths = {source: 0}
+    backwardDepths = {target: 0}
+    forwardLayer = [source]
+    backwardLayer = [target]
+
+    while forwardLayer and backwardLayer:
+        expandForward = len(forwardLayer) <= len(backwardLayer)
+        if expandForward:
+            layer, links, depths = forwardLayer, forward, forwardDepths
+            otherLayer, otherDepths = backwardLayer, backwardDepths
+        else:
+            layer, links, depths = backwardLayer, backward, backwardDepths
+            otherLayer, otherDepths = forwardLayer, forwardDepths
+
+        depth = depths[layer[0]] + 1
+        shortest = math.inf
+        meetings = []
+        nextLayer = []
+        for i, state in enumerate(layer):
+            waiting = len(layer) - i - 1 + len(otherLayer)
+            stats.expanded(state, waiting + len(nextLayer))
+            for movie_id, person_id in neighbors(state):
+                if person_id in otherDepths:
+                    length = depth + otherDepths[person_id]
+                    if length < shortest:
+                        shortest = length
+                        meetings = []
+                    if length == shortest:
+                        meetings.append((state, movie_id, person_id))
+                if person_id not in depths:
+                    depths[person_id] = depth
+                    links[person_id] = [(movie_id, state)]
+                    nextLayer.append(person_id)
+                    stats.enqueued(waiting + len(nextLayer))
+                elif depths[person_id] == depth:
+                    links[person_id].append((movie_id, state))
+
+        if meetings:
+            if not expandForward:
+                meetings = [(after, movie_id, before)
+                            for before, movie_id, after in meetings]
+            return forward, meetings, backward
+
+        if expandForward:
+            forwardLayer = nextLayer
+        else:
+            backwardLayer = nextLayer
+
+    return None
+
+
+def _shortest_paths(forward, meetings, backward):
+    """
+    Yields each path through the links found by _layered_search.
+    """
+    for before, movie_id, after in meetings:
+        for head in _paths_from_root(forward, before):
+            for tail in _paths_to_root(backward, after):
+                yield head + [(movie_id, after)] + tail
+
+
+def _paths_from_root(links, state):
+    """
+    Yields each list of links from the root of `links` to `state`.
+    """
+    if not links[state]:
+        yield []
+        return
+    for movie_id, parent in links[state]:
+        for path in _paths_from_root(links, parent):
+            path.append((movie_id, state))
+            yield path
+
+
+def _paths_to_root(links, state):
+    """
+    Yields each list of links from `state` on to the root of `links`.
+    """
+    if not links[state]:
+        yield []
+        return
+    for movie_id, parent in links[state]:
+        for path in _paths_to_root(links, parent):
+            yield [(movie_id, parent)] + path
+
+
+def _run_search(search, source, target, stats, translate=True):
+    """
+    Runs `search` directly on the compact graph's interned ints when it is
+    loaded, translating the path back to IMDB ids unless `translate` is
+    False, or on the dictionaries otherwise. Counts the search's work in
+    `stats` if given.
+    """
+    if stats is None:
+        stats = SearchStats()
+
+    traced = len(stats.trace)
+    stats.start()
+    if graph is None:
+        path = search(source, target, stats.timed(neighbors_for_person),
+                      stats)
+        stats.stop()
+        return path
+
+    path = search(graph.person_index[source], graph.person_index[target],
+                  stats.timed(graph.neighbors), stats)
+    stats.stop()
+    stats.trace[traced:] = [
+        (expanded, graph.person_ids[person], frontier, elapsed)
+        for expanded, person, frontier, elapsed in stats.trace[traced:]
+    ]
+    if path is None or not translate:
+        return path
+    return _path_ids(path)
+
+
+def _path_ids(path):
+    """
+    Translates a path of interned ints back to IMDB ids.
+    """
+    return [
+        (graph.movie_ids[movie], graph.person_ids[person])
+        for movie, person in path
+    ]
+
+
+def _depth(node):
+    """
+    Returns the number of links between `node` and the root of its search.
+    """
+    depth = 0
+    while node.parent is not None:
+        depth += 1
+        node = node.parent
+    return depth
+
+
+def _path_to(node):
+    """
+    Returns the (movie, person) links from the root of a search to `node`.
+    """
+    links = []
+    while node.parent is not None:
+        links.append((node.action, node.state))
+        node = node.parent
+    links.reverse()
+    return links
+
+
+def _join_path(forwardNode, movie_id, backwardNode):
+    """
+    Stitches a path out of a forward node, the movie linking it to a
+    backward node, and that backward node's chain on to the target.
+    """
+    links = _path_to(forwardNode)
+    links.append((movie_id, backwardNode.state))
+    node = backwardNode
+    while node.parent is not None:
+        links.append((node.action, node.parent.state))
+        node = node.parent
+    return links
 
 
 def person_id_for_name(name):
@@ -133,32 +688,128 @@ def person_id_for_name(name):
     Returns the IMDB id for a person's name,
     resolving ambiguities as needed.
     """
-    person_ids = list(names.get(name.lower(), set()))
+    person_ids = person_ids_for_name(name)
     if len(person_ids) == 0:
-        return None
+        person_ids = suggest_person_ids(name)
+        if len(person_ids) == 0:
+            return None
+        print(f"No one is named '{name}'. Did you mean:")
     elif len(person_ids) > 1:
         print(f"Which '{name}'?")
-        for person_id in person_ids:
-            person = people[person_id]
-            name = person["name"]
-            birth = person["birth"]
-            print(f"ID: {person_id}, Name: {name}, Birth: {birth}")
-        try:
-            person_id = input("Intended Person ID: ")
-            if person_id in person_ids:
-                return person_id
-        except ValueError:
-            pass
-        return None
     else:
         return person_ids[0]
 
+    for person_id in person_ids:
+        name = person_name(person_id)
+        birth = person_birth(person_id)
+        print(f"ID: {person_id}, Name: {name}, Birth: {birth}")
+    try:
+        person_id = input("Intended Person ID: ")
+        if person_id in person_ids:
+            return person_id
+    except ValueError:
+        pass
+    return None
+
+
+def person_ids_for_name(name):
+    """
+    Returns the IMDB ids of every person with a given name,
+    without asking the user to pick one.
+    """
+    if graph is None:
+        return list(names.get(name.lower(), set()))
+    return [graph.person_ids[person] for person in graph.people_named(name)]
+
+
+def person_ids_for_prefix(prefix, limit=10):
+    """
+    Returns the IMDB ids of people whose name starts with `prefix`,
+    ignoring case, in name order.
+    """
+    return _people_at(_name_search().prefix(prefix, limit))[:limit]
+
+
+def person_ids_for_similar_name(name, max_distance=1, limit=10):
+    """
+    Returns the IMDB ids of people whose name is within `max_distance`
+    typos of `name`, ignoring case, closest first.
+    """
+    return _people_at(_name_search().fuzzy(name, max_distance, limit))[:limit]
+
+
+def suggest_person_ids(name, limit=10):
+    """
+    Returns the IMDB ids of people `name` might have meant: those whose
+    name starts with it, then those whose name is one typo away, or two
+    if nobody is one away.
+    """
+    suggestions = person_ids_for_prefix(name, limit)
+    similar = person_ids_for_similar_name(name, 1, limit)
+    if not similar:
+        similar = person_ids_for_similar_name(name, 2, limit)
+    for person_id in similar:
+        if person_id not in suggestions:
+            suggestions.append(person_id)
+    return suggestions[:limit]
+
+
+def _name_search():
+    return name_search if graph is None else graph.name_search
+
+
+def _people_at(positions):
+    """
+    Returns the IMDB ids of the people at positions in the name index.
+    """
+    if graph is not None:
+        return [graph.person_ids[position] for position in positions]
+    person_ids = []
+    for position in positions:
+        person_ids.extend(sorted(names[name_search.names.keys[position]]))
+    return person_ids
+
+
+def is_person_id(person_id):
+    """
+    Returns whether `person_id` is the IMDB id of a loaded person.
+    """
+    if graph is None:
+        return person_id in people
+    return person_id in graph.person_index
+
+
+def person_count():
+    """
+    Returns how many people are loaded.
+    """
+    if graph is None:
+        return len(people)
+    return len(graph.person_ids)
+
+
+def person_row(person_id):
+    """
+    Returns the row of people.csv that `person_id` was loaded from.
+    """
+    if graph is not None:
+        return graph.person_index[person_id]
+    if not rows:
+        rows.update((person_id, row) for row, person_id in enumerate(people))
+    return rows[person_id]
+
 
 def neighbors_for_person(person_id):
     """
     Returns (movie_id, person_id) pairs for people
     who starred with a given person.
     """
+    if graph is not None:
+        return set(
+            (graph.movie_ids[movie], graph.person_ids[person])
+            for movie, person in graph.neighbors(graph.person_index[person_id])
+        )
+
     movie_ids = people[person_id]["movies"]
     neighbors = set()
     for movie_id in movie_ids:
@@ -167,5 +818,32 @@ def neighbors_for_person(person_id):
     return neighbors
 
 
+def person_name(person_id):
+    """
+    Returns the name of the person with IMDB id `person_id`.
+    """
+    if graph is None:
+        return people[person_id]["name"]
+    return graph.person_names[graph.person_index[person_id]]
+
+
+def person_birth(person_id):
+    """
+    Returns the birth year of the person with IMDB id `person_id`.
+    """
+    if graph is None:
+        return people[person_id]["birth"]
+    return graph.person_births[graph.person_index[person_id]]
+
+
+def movie_title(movie_id):
+    """
+    Returns the title of the movie with IMDB id `movie_id`.
+    """
+    if graph is None:
+        return movies[movie_id]["title"]
+    return graph.movie_titles[graph.movie_index[movie_id]]
+
+
 if __name__ == "__main__":
     main()
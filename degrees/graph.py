@@ -0,0 +1,553 @@
+import bisect
+import collections
+import csv
+import zlib
+from array import array
+
+
+class CompactGraph():
+    """
+    Compact form of the degrees dataset.
+
+    People and movies are interned to dense ints (their row order in the
+    CSVs), and the person -> movie and movie -> person adjacency is kept in
+    CSR form: the movies of person `p` are
+    `person_movies[person_offsets[p]:person_offsets[p + 1]]`, and likewise
+    for the stars of a movie.
+
+    Every attribute is a flat sequence of strings or ints, so a graph can
+    be backed either by lists and arrays or by a memory-mapped snapshot.
+    People, movies and stars added after the graph is built go into an
+    overlay on top of those sequences (see `add_person`, `add_movie` and
+    `add_star`), and `compacted` folds the overlay back into CSR form.
+    """
+
+    def __init__(self, person_ids, person_names, person_births,
+                 movie_ids, movie_titles, movie_years,
+                 person_offsets, person_movies, movie_offsets, movie_people,
+                 person_order=None, movie_order=None, name_order=None,
+                 trigrams=None):
+        self.person_ids = person_ids
+        self.person_names = person_names
+        self.person_births = person_births
+        self.movie_ids = movie_ids
+        self.movie_titles = movie_titles
+        self.movie_years = movie_years
+        self.person_offsets = person_offsets
+        self.person_movies = person_movies
+        self.movie_offsets = movie_offsets
+        self.movie_people = movie_people
+
+        self.person_index = SortedIndex(person_ids, person_order)
+        self.movie_index = SortedIndex(movie_ids, movie_order)
+        self.name_index = SortedIndex(person_names, name_order, key=str.lower)
+        self.name_search = NameIndex(self.name_index, trigrams)
+
+        # Overlay of stars added since the CSR arrays were built
+        self.base_people = len(person_offsets) - 1
+        self.base_movies = len(movie_offsets) - 1
+        self.added_movies = {}
+        self.added_people = {}
+
+    @classmethod
+    def from_csv(cls, directory):
+        """
+        Builds a compact graph from the people, movies and stars CSVs
+        in `directory`.
+        """
+        person_ids, person_names, person_births = _read_columns(
+            f"{directory}/people.csv", "id", "name", "birth"
+        )
+        movie_ids, movie_titles, movie_years = _read_columns(
+            f"{directory}/movies.csv", "id", "title", "year"
+        )
+        person_index = {
+            person_id: i for i, person_id in enumerate(person_ids)
+        }
+        movie_index = {
+            movie_id: i for i, movie_id in enumerate(movie_ids)
+        }
+
+        # Encode each (person, movie) star as one int so duplicates collapse
+        # and sorting groups the stars by person
+        stars = set()
+        movie_count = len(movie_ids)
+        for person_id, movie_id in zip(*_read_columns(
+            f"{directory}/stars.csv", "person_id", "movie_id"
+        )):
+            person = person_index.get(person_id)
+            movie = movie_index.get(movie_id)
+            if person is not None and movie is not None:
+                stars.add(person * movie_count + movie)
+
+        people_column = array("i")
+        movies_column = array("i")
+        for star in sorted(stars):
+            person, movie = divmod(star, movie_count)
+            people_column.append(person)
+            movies_column.append(movie)
+
+        person_offsets, person_movies = _csr(
+            len(person_ids), people_column, movies_column
+        )
+        movie_offsets, movie_people = _csr(
+            len(movie_ids), movies_column, people_column
+        )
+        return cls(person_ids, person_names, person_births,
+                   movie_ids, movie_titles, movie_years,
+                   person_offsets, person_movies, movie_offsets, movie_people)
+
+    def movies_for(self, person):
+        """
+        Returns the movies `person` starred in.
+        """
+        if person >= self.base_people:
+            return self.added_movies.get(person, [])
+        movies = self.person_movies[
+            self.person_offsets[person]:self.person_offsets[person + 1]
+        ]
+        if person in self.added_movies:
+            return list(movies) + self.added_movies[person]
+        return movies
+
+    def stars_of(self, movie):
+        """
+        Returns the people who starred in `movie`.
+        """
+        if movie >= self.base_movies:
+            return self.added_people.get(movie, [])
+        stars = self.movie_people[
+            self.movie_offsets[movie]:self.movie_offsets[movie + 1]
+        ]
+        if movie in self.added_people:
+            return list(stars) + self.added_people[movie]
+        return stars
+
+    def neighbors(self, person):
+        """
+        Returns (movie, person) pairs for people who starred with `person`,
+        as interned ints.
+        """
+        neighbors = []
+        for movie in self.movies_for(person):
+            for other in self.stars_of(movie):
+                neighbors.append((movie, other))
+        return neighbors
+
+    def people_named(self, name):
+        """
+        Returns the interned people whose name matches `name`,
+        ignoring case.
+        """
+        return self.name_index.positions(name.lower())
+
+    def add_person(self, person_id, name, birth):
+        """
+        Interns a new person, returning their int.
+        """
+        self.person_ids = _appendable(self.person_ids)
+        self.person_names = _appendable(self.person_names)
+        self.person_births = _appendable(self.person_births)
+        self.person_index.keys = self.person_ids
+        self.name_index.keys = self.person_names
+        person = len(self.person_ids)
+        self.person_ids.append(person_id)
+        self.person_names.append(name)
+        self.person_births.append(birth)
+        self.person_index.add(person)
+        self.name_search.add(person)
+        return person
+
+    def add_movie(self, movie_id, title, year):
+        """
+        Interns a new movie, returning its int.
+        """
+        self.movie_ids = _appendable(self.movie_ids)
+        self.movie_titles = _appendable(self.movie_titles)
+        self.movie_years = _appendable(self.movie_years)
+        self.movie_index.keys = self.movie_ids
+        movie = len(self.movie_ids)
+        self.movie_ids.append(movie_id)
+        self.movie_titles.append(title)
+        self.movie_years.append(year)
+        self.movie_index.add(movie)
+        return movie
+
+    def add_star(self, person, movie):
+        """
+        Records that `person` starred in `movie`, returning False if that
+        was already known.
+        """
+        if movie in self.movies_for(person):
+            return False
+        self.added_movies.setdefault(person, []).append(movie)
+        self.added_people.setdefault(movie, []).append(person)
+        return True
+
+    def apply_delta(self, tables):
+        """
+        Adds the people, movies and stars in the delta `tables`, as read
+        by degrees.read_delta, leaving people and movies already known as
+        they are. Returns the new (person_id, movie_id) stars.
+        """
+        for row in tables["people.csv"]:
+            if row["id"] not in self.person_index:
+                self.add_person(row["id"], row["name"], row["birth"])
+        for row in tables["movies.csv"]:
+            if row["id"] not in self.movie_index:
+                self.add_movie(row["id"], row["title"], row["year"])
+
+        stars = []
+        for row in tables["stars.csv"]:
+            person = self.person_index.get(row["person_id"])
+            movie = self.movie_index.get(row["movie_id"])
+            if person is None or movie is None:
+                continue
+            if self.add_star(person, movie):
+                stars.append((row["person_id"], row["movie_id"]))
+        return stars
+
+    def compacted(self):
+        """
+        Returns a copy of the graph with the overlay folded into fresh
+        CSR arrays, ready to be written to a snapshot.
+        """
+        unchanged = (not self.added_movies
+                     and len(self.person_ids) == self.base_people
+                     and len(self.movie_ids) == self.base_movies)
+        if unchanged:
+            return self
+        person_offsets, person_movies = _flatten(
+            self.movies_for(person) for person in range(len(self.person_ids))
+        )
+        movie_offsets, movie_people = _flatten(
+            self.stars_of(movie) for movie in range(len(self.movie_ids))
+        )
+        return CompactGraph(list(self.person_ids), list(self.person_names),
+                            list(self.person_births), list(self.movie_ids),
+                            list(self.movie_titles), list(self.movie_years),
+                            person_offsets, person_movies,
+                            movie_offsets, movie_people)
+
+
+class SortedIndex():
+    """
+    Maps keys back to their positions in a sequence by binary search over
+    a permutation of the positions sorted by key. Unlike a dict this needs
+    no per-key objects, so it can live in a snapshot as a plain int array.
+    """
+
+    def __init__(self, keys, order=None, key=None):
+        self.keys = keys
+        self.key = key
+        if order is None:
+            order = array("i", sorted(range(len(keys)), key=self.key_of))
+        self.order = order
+        # Positions appended to `keys` after `order` was built
+        self.added = {}
+
+    def key_of(self, position):
+        """
+        Returns the key the index orders `position` by.
+        """
+        if self.key is None:
+            return self.keys[position]
+        return self.key(self.keys[position])
+
+    def add(self, position):
+        """
+        Indexes a position appended to the keys since the index was built.
+        """
+        self.added.setdefault(self.key_of(position), []).append(position)
+
+    def positions(self, value):
+        """
+        Returns every position whose key equals `value`.
+        """
+        start = bisect.bisect_left(self.order, value, key=self.key_of)
+        end = bisect.bisect_right(self.order, value, lo=start, key=self.key_of)
+        return list(self.order[start:end]) + self.added.get(value, [])
+
+    def prefixed(self, prefix, limit=None):
+        """
+        Returns positions whose key starts with `prefix`, in key order,
+        stopping after `limit` of them if given.
+        """
+        positions = []
+        start = bisect.bisect_left(self.order, prefix, key=self.key_of)
+        for i in range(start, len(self.order)):
+            if limit is not None and len(positions) >= limit:
+                break
+            position = self.order[i]
+            if not self.key_of(position).startswith(prefix):
+                break
+            positions.append(position)
+        for key in sorted(self.added):
+            if key.startswith(prefix):
+                positions.extend(self.added[key])
+        return positions[:limit]
+
+    def get(self, value, default=None):
+        positions = self.positions(value)
+        return positions[0] if positions else default
+
+    def __getitem__(self, value):
+        positions = self.positions(value)
+        if not positions:
+            raise KeyError(value)
+        return positions[0]
+
+    def __contains__(self, value):
+        return bool(self.positions(value))
+
+
+class NameIndex():
+    """
+    Prefix and typo-tolerant lookup over the keys of a SortedIndex.
+
+    Prefixes are found by binary search over the sorted keys. For typos,
+    every key is listed under the trigrams (three-character windows) of its
+    lowercased, padded form, stored in CSR form under their CRC32 so the
+    lists can live in a snapshot. One edit changes at most three trigrams,
+    so a key within `d` edits of the query can be missing from at most
+    `3d` of the query's trigram lists. Counting hits over the query's
+    rarest lists narrows the keys down to a few candidates, and only those
+    are checked with a bounded edit distance. Queries with no more than
+    `3d` trigrams are checked against every key instead.
+    """
+
+    def __init__(self, names, trigrams=None):
+        self.names = names
+        if trigrams is None:
+            trigrams = _trigram_lists(names)
+        self.trigram_keys, self.trigram_offsets, self.trigram_postings = \
+            trigrams
+        # Trigram lists of positions added since the index was built
+        self.added = {}
+
+    def add(self, position):
+        """
+        Indexes a position appended to the keys since the index was built.
+        """
+        self.names.add(position)
+        for trigram in _trigrams(self.names.key_of(position)):
+            self.added.setdefault(trigram, []).append(position)
+
+    def prefix(self, prefix, limit=None):
+        """
+        Returns positions whose key starts with `prefix`, ignoring case.
+        """
+        return self.names.prefixed(prefix.lower(), limit)
+
+    def fuzzy(self, query, max_distance=2, limit=None):
+        """
+        Returns positions whose key is within `max_distance` edits of
+        `query`, ignoring case, closest first.
+        """
+        query = query.lower()
+        lists = sorted(
+            (self._posting(trigram) for trigram in _trigrams(query)),
+            key=lambda posting: len(posting[0]) + len(posting[1])
+        )
+        if len(lists) <= 3 * max_distance:
+            # A short query can be within range of keys that share none of
+            # its trigrams, so check every key
+            candidates = range(len(self.names.keys))
+        else:
+            # A close enough key misses at most 3 * max_distance of the
+            # lists, so it shows up at least `needed` times among the
+            # rarest `used`
+            used = min(len(lists), 3 * max_distance + 3)
+            needed = used - 3 * max_distance
+            counts = collections.Counter()
+            for stored, added in lists[:used]:
+                counts.update(stored)
+                counts.update(added)
+            candidates = [
+                position for position, count in counts.items()
+                if count >= needed
+            ]
+
+        matches = []
+        distances = {}
+        for position in candidates:
+            key = self.names.key_of(position)
+            if key not in distances:
+                distances[key] = _edit_distance(query, key, max_distance)
+            if distances[key] <= max_distance:
+                matches.append((distances[key], key, position))
+        matches.sort()
+        return [position for _, _, position in matches[:limit]]
+
+    def _posting(self, trigram):
+        """
+        Returns the positions listed under a trigram, as a slice of the
+        stored lists and a list of positions added since.
+        """
+        added = self.added.get(trigram, [])
+        i = bisect.bisect_left(self.trigram_keys, trigram)
+        if i < len(self.trigram_keys) and self.trigram_keys[i] == trigram:
+            start, end = self.trigram_offsets[i], self.trigram_offsets[i + 1]
+            return self.trigram_postings[start:end], added
+        return (), added
+
+
+class StringTable():
+    """
+    Read-only sequence of strings stored as one UTF-8 buffer plus an array
+    of offsets into it, decoding each string only when it is read.
+    """
+
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+
+    @classmethod
+    def from_strings(cls, strings):
+        data = bytearray()
+        offsets = array("q", [0])
+        for string in strings:
+            data += string.encode("utf-8")
+            offsets.append(len(data))
+        return cls(bytes(data), offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if not 0 <= i < len(self):
+            raise IndexError("string table index out of range")
+        return str(self.data[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+
+class AppendedSequence():
+    """
+    Sequence made of a read-only base sequence, such as a memory-mapped
+    StringTable, followed by items appended in memory.
+    """
+
+    def __init__(self, base):
+        self.base = base
+        self.appended = []
+
+    def append(self, item):
+        self.appended.append(item)
+
+    def __len__(self):
+        return len(self.base) + len(self.appended)
+
+    def __getitem__(self, i):
+        if i < len(self.base):
+            return self.base[i]
+        return self.appended[i - len(self.base)]
+
+
+def _appendable(sequence):
+    """
+    Returns `sequence` itself if it supports append, or an
+    AppendedSequence over it otherwise.
+    """
+    if hasattr(sequence, "append"):
+        return sequence
+    return AppendedSequence(sequence)
+
+
+def _flatten(rows):
+    """
+    Builds CSR offset and index arrays out of an iterable of rows.
+    """
+    offsets = array("i", [0])
+    indices = array("i")
+    for row in rows:
+        indices.extend(row)
+        offsets.append(len(indices))
+    return offsets, indices
+
+
+def _trigrams(key):
+    """
+    Returns the CRC32s of the distinct trigrams of a padded key.
+    """
+    padded = f"  {key} "
+    return set(
+        zlib.crc32(padded[i:i + 3].encode("utf-8"))
+        for i in range(len(padded) - 2)
+    )
+
+
+def _trigram_lists(names):
+    """
+    Builds CSR trigram lists for every position of a SortedIndex,
+    returning (sorted trigram CRCs, offsets, positions).
+    """
+    trigrams = array("I")
+    positions = array("i")
+    for position in range(len(names.keys)):
+        for trigram in _trigrams(names.key_of(position)):
+            trigrams.append(trigram)
+            positions.append(position)
+
+    keys = array("I", sorted(set(trigrams)))
+    rows = {trigram: row for row, trigram in enumerate(keys)}
+    offsets, postings = _csr(
+        len(keys), array("i", (rows[trigram] for trigram in trigrams)),
+        positions
+    )
+    return keys, offsets, postings
+
+
+def _edit_distance(a, b, limit):
+    """
+    Returns the Levenshtein distance between `a` and `b`, or `limit + 1`
+    if it is more than `limit`. Only the diagonal band of the table that
+    can stay within `limit` is filled in.
+    """
+    over = limit + 1
+    if abs(len(a) - len(b)) > limit:
+        return over
+    previous = [min(j, over) for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        current = [over] * (len(b) + 1)
+        current[0] = min(i, over)
+        for j in range(max(1, i - limit), min(len(b), i + limit) + 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1,
+                             previous[j - 1] + (a[i - 1] != b[j - 1]))
+        if min(current) > limit:
+            return over
+        previous = current
+    return min(previous[-1], over)
+
+
+def _read_columns(filename, *fields):
+    """
+    Returns one list per named field of a CSV file with a header row.
+    """
+    with open(filename, encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        positions = [header.index(field) for field in fields]
+        columns = tuple([] for _ in fields)
+        for row in reader:
+            for column, position in zip(columns, positions):
+                column.append(row[position])
+    return columns
+
+
+def _csr(size, rows, columns):
+    """
+    Builds CSR offset and index arrays for `size` rows out of parallel
+    arrays of row and column numbers. Rows need not be sorted; columns
+    keep their input order within a row.
+    """
+    offsets = array("i", bytes(4 * (size + 1)))
+    for row in rows:
+        offsets[row + 1] += 1
+    for i in range(size):
+        offsets[i + 1] += offsets[i]
+
+    indices = array("i", bytes(4 * len(columns)))
+    cursor = offsets[:-1]
+    for row, column in zip(rows, columns):
+        indices[cursor[row]] = column
+        cursor[row] += 1
+    return offsets, indices
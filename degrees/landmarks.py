@@ -0,0 +1,245 @@
+import argparse
+import json
+import math
+import mmap
+import os
+import time
+from array import array
+from collections import deque
+
+from graph import CompactGraph
+from snapshot import fingerprint, load_snapshot, recorded_deltas
+
+# Landmark file layout: MAGIC, an 8-byte little-endian header length, a
+# JSON header padded to 8 bytes, then one array of unsigned shorts per
+# landmark holding its distance to every person, in people.csv row order.
+MAGIC = b"DEGLMK01"
+FILENAME = "degrees.landmarks"
+UNREACHABLE = 0xFFFF
+
+
+class LandmarkIndex():
+    """
+    Breadth-first distances from a few landmark people to everyone else.
+
+    By the triangle inequality, a person at distance a from a landmark and
+    a target at distance b from it are at least |a - b| links apart, which
+    gives A* an admissible, consistent heuristic (the ALT bound).
+    """
+
+    def __init__(self, landmarks, distances, deltas=0):
+        self.landmarks = landmarks
+        self.distances = distances
+        # Deltas applied to the data the distances were measured on
+        self.deltas = deltas
+
+    def bound_to(self, target):
+        """
+        Returns a function giving a lower bound on the number of links from
+        a person's row to the `target` row, or math.inf if the landmarks
+        show the two are not connected at all.
+        """
+        targets = [(table, table[target]) for table in self.distances]
+
+        def bound(row):
+            best = 0
+            for table, to_target in targets:
+                to_row = table[row]
+                if to_row == UNREACHABLE or to_target == UNREACHABLE:
+                    if to_row != to_target:
+                        return math.inf
+                    continue
+                if abs(to_row - to_target) > best:
+                    best = abs(to_row - to_target)
+            return best
+
+        return bound
+
+    def update(self, casts, people, row, neighbors):
+        """
+        Brings the distances up to date after stars are added to the
+        movies whose `casts` are given, leaving `people` people loaded.
+        Casts list people as the loaded data identifies them, `row` gives
+        a person's row, and `neighbors` their (movie, person) links.
+
+        New stars can only shorten distances, so each table is relaxed
+        outwards from the changed casts, touching only the people whose
+        distance actually drops.
+        """
+        for i, table in enumerate(self.distances):
+            # Mapped tables are read-only, and new people need rows
+            if not isinstance(table, array):
+                table = array("H", table)
+            table.extend([UNREACHABLE] * (people - len(table)))
+            self.distances[i] = table
+
+            queue = deque()
+            for cast in casts:
+                nearest = min(table[row(person)] for person in cast)
+                if nearest == UNREACHABLE:
+                    continue
+                for person in cast:
+                    if table[row(person)] > nearest + 1:
+                        table[row(person)] = nearest + 1
+                        queue.append(person)
+
+            while queue:
+                person = queue.popleft()
+                distance = table[row(person)] + 1
+                for _, neighbor in neighbors(person):
+                    if table[row(neighbor)] > distance:
+                        table[row(neighbor)] = distance
+                        queue.append(neighbor)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Precompute landmark distances for A* (ALT) search."
+    )
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--count", type=int, default=16,
+                        help="number of landmarks to pick")
+    parser.add_argument("--snapshot", action="store_true",
+                        help="load the compact graph from a cached snapshot "
+                             "along with the deltas recorded against it")
+    args = parser.parse_args()
+
+    print("Loading data...")
+    graph = None
+    deltas = []
+    if args.snapshot:
+        graph = load_snapshot(args.directory)
+        deltas = recorded_deltas(args.directory)
+    if graph is None:
+        graph = CompactGraph.from_csv(args.directory)
+    for tables in deltas:
+        graph.apply_delta(tables)
+    print("Data loaded.")
+
+    start = time.perf_counter()
+    index = build_landmarks(graph, args.count)
+    index.deltas = len(deltas)
+    save_landmarks(index, args.directory, len(graph.person_ids))
+    print(f"Picked {len(index.landmarks)} landmarks "
+          f"in {time.perf_counter() - start:.2f}s.")
+    for person_id in index.landmarks:
+        person = graph.person_index[person_id]
+        print(f"  {person_id}: {graph.person_names[person]}")
+
+
+def build_landmarks(graph, count):
+    """
+    Picks up to `count` high-degree people from the CompactGraph `graph`
+    as landmarks and breadth-first searches from each of them.
+
+    Candidates are taken in decreasing order of degree, skipping anyone
+    who co-starred with a landmark already picked, so the landmarks
+    spread out instead of clustering in one blockbuster cast.
+    """
+    people = range(len(graph.person_ids))
+    order = sorted(people, key=lambda row: _degree(graph, row), reverse=True)
+
+    landmarks = []
+    distances = []
+    for row in order:
+        if len(landmarks) == count:
+            break
+        if any(table[row] <= 1 for table in distances):
+            continue
+        landmarks.append(row)
+        distances.append(_distances_from(graph, row))
+
+    return LandmarkIndex([graph.person_ids[row] for row in landmarks],
+                         distances)
+
+
+def save_landmarks(index, directory, people, path=None):
+    """
+    Writes `index`, with distances to each of `people` people, to the
+    landmark file for `directory`.
+    """
+    path = path or os.path.join(directory, FILENAME)
+    header = json.dumps({
+        "sources": fingerprint(directory),
+        "landmarks": index.landmarks,
+        "people": people,
+        "deltas": index.deltas,
+    }).encode("utf-8")
+
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(MAGIC)
+        f.write(len(header).to_bytes(8, "little"))
+        f.write(header)
+        f.write(bytes(-f.tell() % 8))
+        for table in index.distances:
+            f.write(memoryview(table).cast("B"))
+    os.replace(temporary, path)
+
+
+def load_landmarks(directory, people, deltas, path=None):
+    """
+    Memory-maps the landmark file for `directory`, returning None if it is
+    missing, or if it was not built from the current source CSVs with
+    `deltas` deltas applied, leaving `people` people.
+    """
+    path = path or os.path.join(directory, FILENAME)
+    try:
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    if mapped[:len(MAGIC)] != MAGIC:
+        return None
+    start = len(MAGIC) + 8
+    length = int.from_bytes(mapped[len(MAGIC):start], "little")
+    header = json.loads(mapped[start:start + length])
+    if header["sources"] != fingerprint(directory):
+        return None
+    if header.get("deltas") != deltas or header["people"] != people:
+        return None
+
+    position = start + length
+    position += -position % 8
+    size = 2 * header["people"]
+    buffer = memoryview(mapped)
+    distances = []
+    for i in range(len(header["landmarks"])):
+        table = buffer[position + i * size:position + (i + 1) * size]
+        distances.append(table.cast("H"))
+
+    index = LandmarkIndex(header["landmarks"], distances, deltas)
+    index.mapped = mapped
+    return index
+
+
+def _degree(graph, person):
+    """
+    Returns how many (movie, co-star) links a person has.
+    """
+    return sum(
+        len(graph.stars_of(movie)) for movie in graph.movies_for(person)
+    )
+
+
+def _distances_from(graph, source):
+    """
+    Breadth-first search from row `source`, returning every row's
+    distance from it.
+    """
+    distances = array("H", [UNREACHABLE]) * len(graph.person_ids)
+    distances[source] = 0
+    queue = deque([source])
+    while queue:
+        row = queue.popleft()
+        distance = distances[row] + 1
+        for _, neighbor in graph.neighbors(row):
+            if distances[neighbor] == UNREACHABLE:
+                distances[neighbor] = min(distance, UNREACHABLE - 1)
+                queue.append(neighbor)
+    return distances
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import sys
+
+import degrees
+from batch import resolve
+from landmarks import load_landmarks
+from util import SearchStats
+
+# Landmark distances, when loaded with --landmarks
+index = None
+
+SEARCHES = {
+    "bfs": degrees.shortest_path,
+    "bidirectional": degrees.bidirectional_shortest_path,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve degrees-of-separation queries over a socket. "
+                    "Each request and reply is one line of JSON."
+    )
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--unix", metavar="PATH",
+                        help="listen on a Unix socket instead of TCP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5050)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="number of worker processes for searches")
+    parser.add_argument("--compact", action="store_true",
+                        help="load into a compact integer-indexed graph")
+    parser.add_argument("--snapshot", action="store_true",
+                        help="load the compact graph from a cached snapshot")
+    parser.add_argument("--landmarks", action="store_true",
+                        help="load landmark distances for the alt search")
+    args = parser.parse_args()
+
+    global index
+    print("Loading data...")
+    degrees.load_data(args.directory, compact=args.compact,
+                      snapshot=args.snapshot)
+    if args.landmarks:
+        index = load_landmarks(args.directory, degrees.person_count(),
+                               degrees.deltas_applied)
+        if index is None:
+            sys.exit("Landmarks missing or out of date; "
+                     "run landmarks.py first.")
+    print("Data loaded.")
+
+    # Workers fork after loading, so they share the data copy-on-write
+    executor = concurrent.futures.ProcessPoolExecutor(
+        args.workers, mp_context=multiprocessing.get_context("fork")
+    )
+    try:
+        asyncio.run(serve(args, executor))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+
+async def serve(args, executor):
+    """
+    Accepts clients until interrupted.
+    """
+    async def client(reader, writer):
+        await handle(reader, writer, executor)
+
+    if args.unix:
+        server = await asyncio.start_unix_server(client, path=args.unix)
+        print(f"Listening on {args.unix}")
+    else:
+        server = await asyncio.start_server(client, args.host, args.port)
+        print(f"Listening on {args.host}:{args.port}")
+    async with server:
+        await server.serve_forever()
+
+
+async def handle(reader, writer, executor):
+    """
+    Answers one client's requests in order until it disconnects.
+
+    Searches run in the executor, so one client's long search does not
+    hold up anyone else's. A request longer than the reader's line limit
+    gets an error reply, and the connection is closed, since the rest of
+    that line cannot be told apart from the next request.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            try:
+                line = await reader.readline()
+            except ValueError:
+                await send(writer, {"error": "request line is too long"})
+                break
+            if not line:
+                break
+            try:
+                request = json.loads(line)
+            except ValueError:
+                reply = {"error": "request is not valid JSON"}
+            else:
+                reply = await loop.run_in_executor(executor, answer, request)
+            await send(writer, reply)
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def send(writer, reply):
+    """
+    Writes one reply line to a client.
+    """
+    writer.write(json.dumps(reply).encode("utf-8") + b"\n")
+    await writer.drain()
+
+
+def answer(request):
+    """
+    Answers one request:
+
+        {"op": "resolve", "name": ...}
+            every IMDB id with that name
+        {"op": "suggest", "name": ..., "limit": ...}
+            people whose name starts with or is a few typos from "name"
+        {"op": "path", "source": ..., "target": ..., "search": ...,
+         "trace_every": ...}
+            shortest path between two names or ids, searching with
+            "bidirectional" (the default), "bfs" or "alt", and tracing
+            every nth expansion if "trace_every" is given
+        {"op": "paths", "source": ..., "target": ..., "k": ...}
+            up to "k" (default 10) of the shortest paths between two
+            names or ids
+    """
+    if not isinstance(request, dict):
+        return {"error": "request must be a JSON object"}
+    op = request.get("op")
+    if op == "resolve":
+        return resolve_name(request)
+    if op == "suggest":
+        return suggest_names(request)
+    if op == "path":
+        return find_path(request)
+    if op == "paths":
+        return find_paths(request)
+    return {"error": f"unknown op {op!r}"}
+
+
+def resolve_name(request):
+    name = request.get("name")
+    if not isinstance(name, str):
+        return {"error": "resolve needs a name"}
+    people = degrees.person_ids_for_name(name)
+    return {"name": name, "people": describe(people)}
+
+
+def suggest_names(request):
+    name, limit = request.get("name"), request.get("limit", 10)
+    if not isinstance(name, str):
+        return {"error": "suggest needs a name"}
+    if not isinstance(limit, int) or limit < 1:
+        return {"error": "limit must be a positive integer"}
+    return {
+        "name": name,
+        "people": describe(degrees.suggest_person_ids(name, limit)),
+    }
+
+
+def describe(person_ids):
+    return [
+        {
+            "id": person_id,
+            "name": degrees.person_name(person_id),
+            "birth": degrees.person_birth(person_id),
+        }
+        for person_id in person_ids
+    ]
+
+
+def find_path(request):
+    source, target = request.get("source"), request.get("target")
+    if not isinstance(source, str) or not isinstance(target, str):
+        return {"error": "path needs a source and a target"}
+    search = request.get("search", "bidirectional")
+    if search == "alt" and index is None:
+        return {"error": "server was started without --landmarks"}
+    if search != "alt" and search not in SEARCHES:
+        return {"error": f"unknown search {search!r}"}
+
+    source_id, error = resolve(source)
+    if error is None:
+        target_id, error = resolve(target)
+    if error is not None:
+        return {"error": error}
+
+    trace_every = request.get("trace_every", 0)
+    if not isinstance(trace_every, int) or trace_every < 0:
+        return {"error": "trace_every must be a non-negative integer"}
+    stats = SearchStats(trace_every)
+    if search == "alt":
+        path = degrees.alt_shortest_path(source_id, target_id, index, stats)
+    else:
+        path = SEARCHES[search](source_id, target_id, stats)
+
+    reply = {
+        "source_id": source_id,
+        "target_id": target_id,
+        "degrees": None if path is None else len(path),
+        "path": path,
+        "stats": dict(search=search, **stats.as_dict()),
+    }
+    if trace_every:
+        reply["trace"] = stats.trace
+    return reply
+
+
+def find_paths(request):
+    source, target = request.get("source"), request.get("target")
+    if not isinstance(source, str) or not isinstance(target, str):
+        return {"error": "paths needs a source and a target"}
+    k = request.get("k", 10)
+    if not isinstance(k, int) or k < 1:
+        return {"error": "k must be a positive integer"}
+
+    source_id, error = resolve(source)
+    if error is None:
+        target_id, error = resolve(target)
+    if error is not None:
+        return {"error": error}
+
+    stats = SearchStats()
+    paths = list(degrees.all_shortest_paths(source_id, target_id, k, stats))
+    return {
+        "source_id": source_id,
+        "target_id": target_id,
+        "degrees": len(paths[0]) if paths else None,
+        "paths": paths,
+        "stats": stats.as_dict(),
+    }
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+import json
+import mmap
+import os
+
+from graph import CompactGraph, StringTable
+
+# Snapshot layout: MAGIC, an 8-byte little-endian header length, a JSON
+# header, then each section's raw bytes starting on an 8-byte boundary.
+# The header records the fingerprint of the CSVs the snapshot was built
+# from and where each section lives relative to the end of the header.
+MAGIC = b"DEGSNAP2"
+SOURCES = ("people.csv", "movies.csv", "stars.csv")
+FILENAME = "degrees.snapshot"
+
+# Deltas recorded against a snapshot, one JSON object per line, replayed
+# on top of it each time it is loaded
+JOURNAL = "degrees.deltas"
+
+STRINGS = ("person_ids", "person_names", "person_births",
+           "movie_ids", "movie_titles", "movie_years")
+ARRAYS = ("person_offsets", "person_movies", "movie_offsets", "movie_people")
+INDEXES = {
+    "person_order": "person_index",
+    "movie_order": "movie_index",
+    "name_order": "name_index",
+}
+TRIGRAMS = (("trigram_keys", "I"), ("trigram_offsets", "i"),
+            ("trigram_postings", "i"))
+
+
+def snapshot_path(directory):
+    """
+    Returns where the snapshot for a dataset directory is kept.
+    """
+    return os.path.join(directory, FILENAME)
+
+
+def fingerprint(directory):
+    """
+    Returns the size and modification time of each source CSV, which
+    together decide whether a snapshot is still current.
+    """
+    sources = []
+    for name in SOURCES:
+        stat = os.stat(os.path.join(directory, name))
+        sources.append([name, stat.st_size, stat.st_mtime_ns])
+    return sources
+
+
+def save_snapshot(graph, directory, path=None):
+    """
+    Writes `graph` to a snapshot for `directory`, replacing any old one.
+    """
+    path = path or snapshot_path(directory)
+    graph = graph.compacted()
+
+    sections = {}
+    for name in STRINGS:
+        table = getattr(graph, name)
+        if not isinstance(table, StringTable):
+            table = StringTable.from_strings(table)
+        sections[f"{name}.data"] = ("B", table.data)
+        sections[f"{name}.offsets"] = ("q", table.offsets)
+    for name in ARRAYS:
+        sections[name] = ("i", getattr(graph, name))
+    for section, index in INDEXES.items():
+        sections[section] = ("i", getattr(graph, index).order)
+    for section, typecode in TRIGRAMS:
+        sections[section] = (typecode, getattr(graph.name_search, section))
+
+    header = {"sources": fingerprint(directory), "sections": {}}
+    position = 0
+    for name, (typecode, values) in sections.items():
+        size = memoryview(values).nbytes
+        header["sections"][name] = [typecode, position, size]
+        position += _padded(size)
+    header = json.dumps(header).encode("utf-8")
+
+    # Write to a temporary file first so a reader never maps a partial one
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(MAGIC)
+        f.write(len(header).to_bytes(8, "little"))
+        f.write(header)
+        f.write(bytes(_padded(f.tell()) - f.tell()))
+        for typecode, values in sections.values():
+            size = f.write(memoryview(values).cast("B"))
+            f.write(bytes(_padded(size) - size))
+    os.replace(temporary, path)
+
+
+def load_snapshot(directory, path=None):
+    """
+    Memory-maps the snapshot for `directory` and returns it as a
+    CompactGraph, or returns None if there is no snapshot or the source
+    CSVs have changed since it was written.
+    """
+    path = path or snapshot_path(directory)
+    try:
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    if mapped[:len(MAGIC)] != MAGIC:
+        return None
+    length = int.from_bytes(mapped[len(MAGIC):len(MAGIC) + 8], "little")
+    start = len(MAGIC) + 8
+    try:
+        header = json.loads(mapped[start:start + length])
+    except ValueError:
+        return None
+    if header["sources"] != fingerprint(directory):
+        return None
+
+    base = _padded(start + length)
+    buffer = memoryview(mapped)
+    sections = {}
+    for name, (typecode, position, size) in header["sections"].items():
+        section = buffer[base + position:base + position + size]
+        if typecode != "B":
+            section = section.cast(typecode)
+        sections[name] = section
+
+    strings = [
+        StringTable(sections[f"{name}.data"], sections[f"{name}.offsets"])
+        for name in STRINGS
+    ]
+    arrays = [sections[name] for name in ARRAYS]
+    indexes = [sections[name] for name in INDEXES]
+    trigrams = tuple(sections[name] for name, _ in TRIGRAMS)
+    graph = CompactGraph(*strings, *arrays, *indexes, trigrams=trigrams)
+
+    # Keep the mapping open for as long as the graph is in use
+    graph.mapped = mapped
+    return graph
+
+
+def record_delta(directory, rows):
+    """
+    Records in the journal for `directory` that the delta `rows`, as read
+    by degrees.read_delta, should be applied on top of the current source
+    CSVs. The rows themselves are kept, so the delta's own files can be
+    moved or deleted afterwards.
+    """
+    entry = {"sources": fingerprint(directory), "rows": rows}
+    with open(os.path.join(directory, JOURNAL), "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry) + "\n")
+
+
+def recorded_deltas(directory):
+    """
+    Returns the rows of the deltas recorded for `directory`, oldest
+    first. Deltas recorded against older versions of the source CSVs are
+    skipped, since those CSVs have since been replaced.
+    """
+    try:
+        with open(os.path.join(directory, JOURNAL), encoding="utf-8") as f:
+            entries = [json.loads(line) for line in f if line.strip()]
+    except OSError:
+        return []
+    sources = fingerprint(directory)
+    return [
+        entry["rows"] for entry in entries if entry["sources"] == sources
+    ]
+
+
+def _padded(size):
+    """
+    Rounds `size` up to the next multiple of 8 bytes.
+    """
+    return (size + 7) // 8 * 8
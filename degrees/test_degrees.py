@@ -0,0 +1,191 @@
+import asyncio
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+import degrees
+import server
+from graph import CompactGraph, NameIndex, SortedIndex
+from landmarks import build_landmarks
+from snapshot import load_snapshot, record_delta, recorded_deltas, \
+    save_snapshot
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def run(script, *args, stdin="", fails=False):
+    """
+    Runs one of the project's scripts, returning what it printed, or what
+    it exited with if it is expected to fail.
+    """
+    result = subprocess.run(
+        [sys.executable, os.path.join(HERE, script), *args],
+        input=stdin, capture_output=True, text=True, cwd=HERE
+    )
+    assert (result.returncode != 0) == fails, result.stderr
+    return result.stderr if fails else result.stdout
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    """
+    A copy of the small dataset, and a delta that links Emma Watson, who
+    starts out in no movies, to Jack Nicholson.
+    """
+    directory = tmp_path / "small"
+    shutil.copytree(os.path.join(HERE, "small"), directory,
+                    ignore=shutil.ignore_patterns("degrees.*"))
+    delta = tmp_path / "delta"
+    delta.mkdir()
+    (delta / "movies.csv").write_text('id,title,year\n1,"Test Film",2000\n')
+    (delta / "stars.csv").write_text(
+        "person_id,movie_id\n914612,1\n197,1\n"
+    )
+    return str(directory), str(delta)
+
+
+@pytest.fixture(params=["dicts", "compact", "snapshot"])
+def loaded(request, dataset, monkeypatch):
+    """
+    Loads the dataset into fresh copies of degrees' globals, in each of
+    the ways degrees.py can hold it.
+    """
+    for name in ("names", "people", "movies", "rows"):
+        monkeypatch.setattr(degrees, name, {})
+    monkeypatch.setattr(degrees, "graph", None)
+    monkeypatch.setattr(degrees, "name_search", None)
+    directory, delta = dataset
+    degrees.load_data(directory, compact=request.param == "compact",
+                      snapshot=request.param == "snapshot")
+    return directory, delta
+
+
+def test_search_lengths(loaded):
+    directory, _ = loaded
+    index = build_landmarks(CompactGraph.from_csv(directory), 2)
+    with open(os.path.join(directory, "people.csv"), encoding="utf-8") as f:
+        people = [row.split(",")[0] for row in f.read().splitlines()[1:]]
+
+    connected = 0
+    for source in people:
+        for target in people:
+            # The original breadth-first search never finds a path from
+            # someone to themselves, so only distinct people are compared
+            if source == target:
+                continue
+            paths = [
+                degrees.shortest_path(source, target),
+                degrees.bidirectional_shortest_path(source, target),
+                degrees.alt_shortest_path(source, target, index),
+            ]
+            paths += degrees.all_shortest_paths(source, target)
+            lengths = {None if path is None else len(path)
+                       for path in paths}
+            assert len(lengths) == 1, (source, target, paths)
+            for path in paths:
+                if path is None:
+                    continue
+                connected += 1
+                person = source
+                for movie, next_person in path:
+                    assert (movie, next_person) in \
+                        degrees.neighbors_for_person(person)
+                    person = next_person
+                assert person == target
+    assert connected
+
+
+@pytest.mark.parametrize("mode", [[], ["--compact"], ["--snapshot"]])
+def test_landmarks_with_delta(dataset, mode):
+    directory, delta = dataset
+    names = "Emma Watson\nKevin Bacon\n"
+    run("landmarks.py", directory, "--count", "2",
+        *(["--snapshot"] if "--snapshot" in mode else []))
+
+    assert "Not connected." in run("degrees.py", directory, *mode,
+                                   "--landmarks", stdin=names)
+    output = run("degrees.py", directory, *mode, "--landmarks",
+                 "--delta", delta, stdin=names)
+    assert "2 degrees of separation." in output
+
+    if "--snapshot" in mode:
+        # The delta is journaled, and the landmarks saved to match it
+        output = run("degrees.py", directory, *mode, "--landmarks",
+                     stdin=names)
+        assert "2 degrees of separation." in output
+
+
+def test_server_needs_landmarks(dataset):
+    directory, _ = dataset
+    error = run("server.py", directory, "--landmarks", fails=True)
+    assert "Landmarks missing or out of date" in error
+
+
+def test_server_rejects_long_lines(tmp_path):
+    async def exchange():
+        path = str(tmp_path / "socket")
+        listener = await asyncio.start_unix_server(
+            lambda reader, writer: server.handle(reader, writer, None),
+            path=path
+        )
+        async with listener:
+            reader, writer = await asyncio.open_unix_connection(path)
+            writer.write(b"x" * (1 << 17) + b"\n")
+            await writer.drain()
+            reply = json.loads(await reader.readline())
+            closed = await reader.read() == b""
+            writer.close()
+            return reply, closed
+
+    reply, closed = asyncio.run(exchange())
+    assert reply == {"error": "request line is too long"}
+    assert closed
+
+
+def test_fuzzy_names():
+    names = ["al", "bob", "kevin bacon", "kevin costner"]
+    index = NameIndex(SortedIndex(names))
+
+    def fuzzy(query, max_distance):
+        return [names[i] for i in index.fuzzy(query, max_distance)]
+
+    # Short names can be a typo apart without sharing any trigrams
+    assert fuzzy("el", 1) == ["al"]
+    assert fuzzy("Kevn Bacon", 1) == ["kevin bacon"]
+    assert fuzzy("kevin", 1) == []
+
+
+def test_snapshot_round_trip(dataset):
+    directory, _ = dataset
+    graph = CompactGraph.from_csv(directory)
+    save_snapshot(graph, directory)
+    loaded = load_snapshot(directory)
+    assert list(loaded.person_ids) == list(graph.person_ids)
+    assert list(loaded.movie_ids) == list(graph.movie_ids)
+    for person in range(len(graph.person_ids)):
+        assert loaded.person_names[person] == graph.person_names[person]
+        assert sorted(loaded.neighbors(person)) == \
+            sorted(graph.neighbors(person))
+
+    # Any change to the CSVs makes the snapshot stale
+    with open(os.path.join(directory, "movies.csv"), "a") as f:
+        f.write('2,"Another Film",2001\n')
+    assert load_snapshot(directory) is None
+
+
+def test_journal_round_trip(dataset):
+    directory, delta = dataset
+    tables = degrees.read_delta(delta)
+    assert recorded_deltas(directory) == []
+    record_delta(directory, tables)
+    record_delta(directory, {"stars": []})
+    assert recorded_deltas(directory) == [tables, {"stars": []}]
+
+    # Deltas recorded against CSVs that have since changed are dropped
+    with open(os.path.join(directory, "movies.csv"), "a") as f:
+        f.write('2,"Another Film",2001\n')
+    assert recorded_deltas(directory) == []
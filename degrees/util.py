@@ -1,3 +1,7 @@
+import time
+from collections import deque
+
+
 class Node():
     def __init__(self, state, parent, action):
         self.state = state
@@ -7,25 +11,45 @@ class Node():
 
 class StackFrontier():
     def __init__(self):
-        self.frontier = []
+        # Nodes in insertion order, plus an index of state -> nodes with
+        # that state so membership checks don't scan the frontier
+        self.frontier = deque()
+        self.states = {}
 
     def add(self, node):
         self.frontier.append(node)
+        self.states.setdefault(node.state, deque()).append(node)
 
     def contains_state(self, state):
-        return any(node.state == state for node in self.frontier)
+        return state in self.states
 
     def empty(self):
         return len(self.frontier) == 0
 
+    def __len__(self):
+        return len(self.frontier)
+
     def remove(self):
         if self.empty():
             raise Exception("empty frontier")
         else:
-            node = self.frontier[-1]
-            self.frontier = self.frontier[:-1]
+            node = self.frontier.pop()
+            self._forget(node, last=True)
             return node
 
+    def _forget(self, node, last):
+        """
+        Drops `node` from the state index. Nodes sharing a state leave the
+        frontier in the same order they leave the index.
+        """
+        nodes = self.states[node.state]
+        if last:
+            nodes.pop()
+        else:
+            nodes.popleft()
+        if not nodes:
+            del self.states[node.state]
+
 
 class QueueFrontier(StackFrontier):
 
@@ -33,6 +57,64 @@ class QueueFrontier(StackFrontier):
         if self.empty():
             raise Exception("empty frontier")
         else:
-            node = self.frontier[0]
-            self.frontier = self.frontier[1:]
+            node = self.frontier.popleft()
+            self._forget(node, last=False)
             return node
+
+
+class SearchStats():
+    """
+    Counters a search fills in as it runs, for profiling without printing
+    on every node.
+
+    With `trace_every` set to n, every nth expansion is also recorded in
+    `trace` as (nodes expanded so far, state, frontier size, seconds
+    since the search started).
+    """
+
+    def __init__(self, trace_every=0):
+        self.nodes_expanded = 0
+        self.nodes_enqueued = 0
+        self.peak_frontier = 0
+        self.neighbor_time = 0.0
+        self.wall_time = 0.0
+        self.trace_every = trace_every
+        self.trace = []
+        self.started = None
+
+    def start(self):
+        self.started = time.perf_counter()
+
+    def stop(self):
+        self.wall_time += time.perf_counter() - self.started
+
+    def expanded(self, state, frontier_size):
+        self.nodes_expanded += 1
+        if self.trace_every and self.nodes_expanded % self.trace_every == 0:
+            self.trace.append((self.nodes_expanded, state, frontier_size,
+                               time.perf_counter() - self.started))
+
+    def enqueued(self, frontier_size):
+        self.nodes_enqueued += 1
+        if frontier_size > self.peak_frontier:
+            self.peak_frontier = frontier_size
+
+    def timed(self, neighbors):
+        """
+        Wraps a neighbors function so the time spent in it is counted.
+        """
+        def timed_neighbors(state):
+            start = time.perf_counter()
+            result = neighbors(state)
+            self.neighbor_time += time.perf_counter() - start
+            return result
+        return timed_neighbors
+
+    def as_dict(self):
+        return {
+            "nodes_expanded": self.nodes_expanded,
+            "nodes_enqueued": self.nodes_enqueued,
+            "peak_frontier": self.peak_frontier,
+            "neighbor_ms": self.neighbor_time * 1000,
+            "wall_ms": self.wall_time * 1000,
+        }
@@ -0,0 +1,146 @@
+import numpy as np
+
+from factors import distributions, tables
+
+# Assignments scored at once
+BATCH = 1 << 16
+
+
+class Pedigree():
+    """
+    A family from load_data as arrays of indexes: people are numbered
+    in the order given, and the parents of person `children[i]` are
+    `mothers[i]` and `fathers[i]`.
+    """
+
+    def __init__(self, people):
+        self.people = list(people)
+        index = {person: i for i, person in enumerate(self.people)}
+        founders, children, mothers, fathers = [], [], [], []
+        for i, data in enumerate(people.values()):
+            if data["mother"] is None:
+                founders.append(i)
+            else:
+                children.append(i)
+                mothers.append(index[data["mother"]])
+                fathers.append(index[data["father"]])
+        self.founders = np.array(founders, dtype=np.int64)
+        self.children = np.array(children, dtype=np.int64)
+        self.mothers = np.array(mothers, dtype=np.int64)
+        self.fathers = np.array(fathers, dtype=np.int64)
+
+        traits = [data["trait"] for data in people.values()]
+        self.known = np.array(
+            [i for i, trait in enumerate(traits) if trait is not None],
+            dtype=np.int64
+        )
+        self.observed = np.array(
+            [trait for trait in traits if trait is not None], dtype=np.int8
+        )
+        self.unknown = np.array(
+            [i for i, trait in enumerate(traits) if trait is None],
+            dtype=np.int64
+        )
+
+    def __len__(self):
+        return len(self.people)
+
+
+def log_joint_probabilities(pedigree, genes, traits, probs):
+    """
+    Returns the log joint probability of each row of assignments: row
+    b gives person i `genes[b, i]` copies of the gene, and the trait if
+    `traits[b, i]` is 1.
+
+    Every person's factor is gathered from the model's tables for the
+    whole batch at once, in place of joint_probability's lookups.
+    """
+    founder, inherited, trait = (np.log(table) for table in tables(probs))
+    return (
+        _log_inheritance(pedigree, genes, founder, inherited)
+        + trait[genes, traits].sum(axis=1)
+    )
+
+
+def log_evidence_probabilities(pedigree, genes, probs):
+    """
+    Returns the log probability of each row of gene assignments
+    together with the known traits, with unknown traits summed out.
+
+    Given someone's genes, their trait chances add up to 1, so an
+    unknown trait drops out of the sum altogether.
+    """
+    founder, inherited, trait = (np.log(table) for table in tables(probs))
+    return (
+        _log_inheritance(pedigree, genes, founder, inherited)
+        + trait[genes[:, pedigree.known], pedigree.observed].sum(axis=1)
+    )
+
+
+def enumerate_marginals(people, probs, batch=BATCH, sum_traits=False):
+    """
+    Returns every person's gene and trait distributions by scoring
+    every assignment of genes, and of traits that agree with the known
+    ones, `batch` assignments at a time.
+
+    Assignment numbers are split into a base 3 digit for each person's
+    genes and a bit for each unknown trait. Weights are accumulated
+    with np.add.at, relative to the largest log joint seen so far so
+    that long families do not underflow.
+
+    With `sum_traits`, only genes are enumerated, 2 ** unknowns fewer
+    assignments. Unknown traits are summed out of each score, and their
+    distributions built from each assignment's trait table rows.
+    """
+    pedigree = Pedigree(people)
+    n = len(pedigree)
+    unknown = len(pedigree.unknown)
+    powers = 3 ** np.arange(n, dtype=np.int64)
+    bits = np.arange(unknown, dtype=np.int64)
+    people_axis = np.arange(n)
+    _, _, trait = tables(probs)
+
+    genes_total = np.zeros((n, 3))
+    traits_total = np.zeros((n, 2))
+    scale = -np.inf
+    total = 3 ** n if sum_traits else 3 ** n * 2 ** unknown
+    for first in range(0, total, batch):
+        numbers = np.arange(first, min(first + batch, total), dtype=np.int64)
+        genes = numbers[:, None] // powers % 3
+        if sum_traits:
+            scores = log_evidence_probabilities(pedigree, genes, probs)
+        else:
+            traits = np.empty((len(numbers), n), dtype=np.int64)
+            traits[:, pedigree.known] = pedigree.observed
+            traits[:, pedigree.unknown] = (numbers[:, None] // 3 ** n
+                                           >> bits & 1)
+            scores = log_joint_probabilities(pedigree, genes, traits, probs)
+
+        top = scores.max()
+        if top > scale:
+            genes_total *= np.exp(scale - top)
+            traits_total *= np.exp(scale - top)
+            scale = top
+        weights = np.exp(scores - scale)[:, None]
+        np.add.at(genes_total, (people_axis, genes), weights)
+        if sum_traits:
+            traits_total[pedigree.known, pedigree.observed] += weights.sum()
+            traits_total[pedigree.unknown] += np.einsum(
+                "b,bij->ij", weights[:, 0],
+                trait[genes[:, pedigree.unknown]]
+            )
+        else:
+            np.add.at(traits_total, (people_axis, traits), weights)
+    return distributions(pedigree.people, genes_total, traits_total)
+
+
+def _log_inheritance(pedigree, genes, founder, inherited):
+    """
+    Returns the log probability of each row of gene assignments, from
+    the log tables `founder` and `inherited`.
+    """
+    return (
+        founder[genes[:, pedigree.founders]].sum(axis=1)
+        + inherited[genes[:, pedigree.mothers], genes[:, pedigree.fathers],
+                    genes[:, pedigree.children]].sum(axis=1)
+    )
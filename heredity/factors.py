@@ -0,0 +1,268 @@
+import numpy as np
+
+# Number of values each kind of variable takes
+VALUES = {"gene": 3, "trait": 2}
+
+# Most entries any clique's table may have, about 128MB
+LARGEST = 1 << 24
+
+
+class Factor():
+    """
+    A table of non-negative values with one axis per variable.
+
+    Variables are ("gene", person), indexed by the number of copies of
+    the gene, and ("trait", person), indexed by False then True.
+    """
+
+    def __init__(self, variables, table):
+        self.variables = list(variables)
+        self.table = np.asarray(table, dtype=np.float64)
+
+
+def tables(probs):
+    """
+    Returns the model in `probs` as arrays indexed by numbers of copies
+    of the gene and by traits (False then True):
+
+        founder[gene], the chance someone without parents has `gene`;
+        inherited[mother, father, gene], the chance a child of parents
+            with those genes has `gene`;
+        trait[gene, trait], the chance someone with `gene` has `trait`.
+    """
+    # Chance a parent with 0, 1 or 2 copies passes the gene on
+    mutation = probs["mutation"]
+    passes = np.array([mutation, 0.5, 1 - mutation])
+    keeps = 1 - passes
+    inherited = np.stack([
+        np.outer(keeps, keeps),
+        np.outer(passes, keeps) + np.outer(keeps, passes),
+        np.outer(passes, passes),
+    ], axis=-1)
+    founder = np.array([probs["gene"][copies] for copies in range(3)])
+    trait = np.array([
+        [probs["trait"][copies][False], probs["trait"][copies][True]]
+        for copies in range(3)
+    ])
+    return founder, inherited, trait
+
+
+def pedigree_factors(people, probs):
+    """
+    Returns the factors of the model in `probs` over the family in
+    `people`: for each person, a gene table conditioned on their
+    parents, or unconditional if they have none, and a trait table
+    conditioned on their genes.
+
+    Where a person's trait is known, their trait table is zero for the
+    other value, so the factors multiply out to the joint probability
+    of the evidence.
+    """
+    founder, inherited, trait = tables(probs)
+    factors = []
+    for person, data in people.items():
+        gene = ("gene", person)
+        if data["mother"] is None:
+            factors.append(Factor([gene], founder))
+        else:
+            factors.append(Factor(
+                [("gene", data["mother"]), ("gene", data["father"]), gene],
+                inherited
+            ))
+        table = trait
+        if data["trait"] is not None:
+            table = trait * [not data["trait"], data["trait"]]
+        factors.append(Factor([gene, ("trait", person)], table))
+    return factors
+
+
+def elimination_order(factors):
+    """
+    Returns an order in which to sum out every variable in `factors`,
+    chosen greedily to add the fewest new links between variables, with
+    ties going to the variable with the fewest neighbours.
+
+    Summing out in this order keeps intermediate factors small: for a
+    family tree they stay within a few people at a time.
+    """
+    neighbours = {}
+    for factor in factors:
+        for variable in factor.variables:
+            neighbours.setdefault(variable, set()).update(factor.variables)
+    for variable, linked in neighbours.items():
+        linked.discard(variable)
+
+    def fill(variable):
+        linked = list(neighbours[variable])
+        missing = sum(
+            linked[j] not in neighbours[linked[i]]
+            for i in range(len(linked)) for j in range(i + 1, len(linked))
+        )
+        return missing, len(linked)
+
+    order = []
+    while neighbours:
+        variable = min(neighbours, key=fill)
+        linked = neighbours.pop(variable)
+        for other in linked:
+            neighbours[other].discard(variable)
+            neighbours[other].update(linked - {other})
+        order.append(variable)
+    return order
+
+
+def calibrate(factors, order):
+    """
+    Passes messages over the tree of cliques formed by summing out the
+    variables of `factors` in `order`, returning each clique's
+    variables, their belief table and the indexes of the factors
+    assigned to it.
+
+    Each clique holds a variable and the neighbours it has when summed
+    out, and sends its message to the clique of the first of those
+    neighbours to go. One pass up the tree and one back down leave
+    every belief proportional to the marginal over its clique, so
+    every person's distribution comes out of the same two passes.
+
+    Raises ValueError if a clique would have more than LARGEST entries.
+    """
+    position = {variable: i for i, variable in enumerate(order)}
+    neighbours = {variable: set() for variable in order}
+    local = [[] for _ in order]
+    assigned = [[] for _ in order]
+    for number, factor in enumerate(factors):
+        for variable in factor.variables:
+            neighbours[variable].update(factor.variables)
+        first = min(position[variable] for variable in factor.variables)
+        local[first].append(factor)
+        assigned[first].append(number)
+
+    separators, parents = [], []
+    children = [[] for _ in order]
+    for i, variable in enumerate(order):
+        linked = neighbours.pop(variable)
+        linked.discard(variable)
+        for other in linked:
+            neighbours[other].discard(variable)
+            neighbours[other].update(linked - {other})
+        separator = sorted(linked, key=position.get)
+        size = np.prod([VALUES[kind] for kind, _ in separator + [variable]])
+        if size > LARGEST:
+            raise ValueError(
+                f"family too interrelated for exact inference: a table of "
+                f"{size} entries would be needed"
+            )
+        separators.append(separator)
+        parents.append(position[separator[0]] if separator else None)
+        if separator:
+            children[parents[-1]].append(i)
+
+    # Messages are rescaled as they go, so large families do not
+    # underflow; beliefs are only ever used normalized
+    up = [None] * len(order)
+    for i, parent in enumerate(parents):
+        if parent is not None:
+            up[i] = _message(
+                local[i] + [up[child] for child in children[i]],
+                separators[i]
+            )
+
+    down = [None] * len(order)
+    for i in reversed(range(len(order))):
+        parent = parents[i]
+        if parent is None:
+            continue
+        incoming = local[parent] + [
+            up[child] for child in children[parent] if child != i
+        ]
+        if down[parent] is not None:
+            incoming.append(down[parent])
+        down[i] = _message(incoming, separators[i])
+
+    cliques = []
+    for i, variable in enumerate(order):
+        variables = [variable] + separators[i]
+        incoming = local[i] + [up[child] for child in children[i]]
+        if down[i] is not None:
+            incoming.append(down[i])
+        cliques.append(
+            (variables, _contract(incoming, variables), assigned[i])
+        )
+    return cliques
+
+
+def marginals(people, probs):
+    """
+    Returns every person's gene and trait distributions given the
+    known traits in `people`, in the same form as the probabilities
+    heredity.main computes by enumeration.
+    """
+    factors = pedigree_factors(people, probs)
+    cliques = calibrate(factors, elimination_order(factors))
+
+    # pedigree_factors gives each person a gene table then a trait
+    # table, and the clique holding the trait table has both variables
+    holders = {}
+    for variables, belief, assigned in cliques:
+        for number in assigned:
+            holders[number] = (variables, belief)
+
+    genes = np.empty((len(people), 3))
+    traits = np.empty((len(people), 2))
+    for number, person in enumerate(people):
+        variables, belief = holders[2 * number + 1]
+        joint = _contract([Factor(variables, belief)],
+                          [("gene", person), ("trait", person)])
+        genes[number], traits[number] = joint.sum(axis=1), joint.sum(axis=0)
+    return distributions(people, genes, traits)
+
+
+def distributions(people, genes, traits):
+    """
+    Returns the probabilities dictionary heredity.main prints, from
+    arrays with a row for each person in `people` of weights for 0, 1
+    or 2 copies of the gene and for not having or having the trait.
+    Each row is normalized to sum to 1.
+    """
+    genes = genes / genes.sum(axis=1, keepdims=True)
+    traits = traits / traits.sum(axis=1, keepdims=True)
+    return {
+        person: {
+            "gene": {2: gene[2], 1: gene[1], 0: gene[0]},
+            "trait": {True: trait[1], False: trait[0]},
+        }
+        for person, gene, trait in zip(people, genes.tolist(),
+                                       traits.tolist())
+    }
+
+
+def _message(factors, variables):
+    """
+    Returns the factor over `variables` left from multiplying
+    `factors` and summing out the rest, scaled to a largest value of 1.
+    """
+    table = _contract(factors, variables)
+    largest = table.max()
+    if largest > 0:
+        table /= largest
+    return Factor(variables, table)
+
+
+def _contract(factors, variables):
+    """
+    Multiplies `factors` together and sums out everything but
+    `variables`, returning a table with an axis for each of them.
+    Variables none of the factors depend on are spread evenly.
+    """
+    axes = {}
+    operands = []
+    for factor in factors:
+        operands.append(factor.table)
+        operands.append([axes.setdefault(variable, len(axes))
+                         for variable in factor.variables])
+    for variable in variables:
+        if variable not in axes:
+            operands.append(np.ones(VALUES[variable[0]]))
+            operands.append([axes.setdefault(variable, len(axes))])
+    operands.append([axes[variable] for variable in variables])
+    return np.einsum(*operands)
@@ -1,7 +1,12 @@
+import argparse
 import csv
 import itertools
 import sys
 
+from enumeration import enumerate_marginals
+from factors import marginals
+from sampling import SamplerStats, gibbs_sampling, likelihood_weighting
+
 PROBS = {
 
     # Unconditional probabilities for having gene
@@ -38,12 +43,60 @@ PROBS = {
 
 
 def main():
+    parser = argparse.ArgumentParser(
+        description="Compute how likely each person is to have the gene "
+                    "and the trait, given the traits that are known."
+    )
+    parser.add_argument("data", help="CSV of people, parents and traits")
+    parser.add_argument("--method", choices=sorted({**METHODS, **SAMPLERS}),
+                        default="eliminate",
+                        help="how to compute the probabilities")
+    parser.add_argument("--samples", type=int,
+                        help="samples to draw when sampling")
+    parser.add_argument("--seconds", type=float,
+                        help="time to spend sampling, instead of a number "
+                             "of samples")
+    parser.add_argument("--seed", type=int, help="seed to sample with")
+    args = parser.parse_args()
+    people = load_data(args.data)
+
+    stats = SamplerStats()
+    try:
+        if args.method in SAMPLERS:
+            probabilities = SAMPLERS[args.method](
+                people, args.samples, args.seconds, args.seed, stats
+            )
+        else:
+            probabilities = METHODS[args.method](people)
+    except ValueError as error:
+        sys.exit(str(error))
 
-    # Check for proper usage
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python heredity.py data.csv")
-    people = load_data(sys.argv[1])
+    # Print results
+    for person in people:
+        print(f"{person}:")
+        for field in probabilities[person]:
+            print(f"  {field.capitalize()}:")
+            for value in probabilities[person][field]:
+                p = probabilities[person][field][value]
+                print(f"    {value}: {p:.4f}")
 
+    if args.method in SAMPLERS:
+        print(f"Drew {stats.samples} samples in {stats.seconds:.2f}s.")
+        if len(stats.changes) > 1:
+            print(f"Largest change in the last batch: "
+                  f"{stats.changes[-1][1]:.2e}")
+        if stats.effective_samples is not None:
+            print(f"Effective sample size: {stats.effective_samples:.0f}")
+        if stats.rhat is not None:
+            print(f"Largest R-hat across chains: {stats.rhat:.4f}")
+
+
+def enumerate_probabilities(people):
+    """
+    Return every person's gene and trait distributions by summing the
+    joint probability of every assignment of genes and traits that
+    agrees with the known traits.
+    """
     # Keep track of gene and trait probabilities for each person
     probabilities = {
         person: {
@@ -83,15 +136,38 @@ def main():
 
     # Ensure probabilities sum to 1
     normalize(probabilities)
+    return probabilities
 
-    # Print results
-    for person in people:
-        print(f"{person}:")
-        for field in probabilities[person]:
-            print(f"  {field.capitalize()}:")
-            for value in probabilities[person][field]:
-                p = probabilities[person][field][value]
-                print(f"    {value}: {p:.4f}")
+
+def batch_probabilities(people):
+    """
+    Return every person's gene and trait distributions, the same as
+    `enumerate_probabilities`, by scoring whole batches of assignments
+    at once with NumPy.
+    """
+    return enumerate_marginals(people, PROBS)
+
+
+def evidence_probabilities(people):
+    """
+    Return every person's gene and trait distributions, the same as
+    `enumerate_probabilities`, enumerating only genes: known traits
+    are fixed, and unknown ones summed out for each person.
+    """
+    return enumerate_marginals(people, PROBS, sum_traits=True)
+
+
+def eliminate_probabilities(people):
+    """
+    Return every person's gene and trait distributions, the same as
+    `enumerate_probabilities`, by passing messages between the family's
+    gene and trait tables along a variable elimination order.
+
+    Work grows with the number of people rather than exponentially, as
+    long as lines of descent do not cross too often, so this handles
+    families far too large to enumerate.
+    """
+    return marginals(people, PROBS)
 
 
 def load_data(filename):
@@ -244,5 +320,46 @@ def normalize(probabilities):
             probabilities[person]["gene"][gene] /= geneNormalizationFactor
 
 
+def likelihood_probabilities(people, samples=None, seconds=None, seed=None,
+                             stats=None):
+    """
+    Return every person's gene and trait distributions estimated by
+    likelihood weighting, drawing `samples` samples or for `seconds`
+    seconds from a generator seeded with `seed`.
+
+    Pass a SamplerStats as `stats` to read back the effective sample
+    size and how the estimates settled.
+    """
+    return likelihood_weighting(people, PROBS, samples, seconds, seed,
+                                stats=stats)
+
+
+def gibbs_probabilities(people, samples=None, seconds=None, seed=None,
+                        stats=None):
+    """
+    Return every person's gene and trait distributions estimated by
+    Gibbs sampling, drawing `samples` samples or for `seconds` seconds
+    from a generator seeded with `seed`.
+
+    Pass a SamplerStats as `stats` to read back R-hat across the chains
+    and how the estimates settled.
+    """
+    return gibbs_sampling(people, PROBS, samples, seconds, seed,
+                          stats=stats)
+
+
+METHODS = {
+    "enumerate": enumerate_probabilities,
+    "batch": batch_probabilities,
+    "evidence": evidence_probabilities,
+    "eliminate": eliminate_probabilities,
+}
+
+SAMPLERS = {
+    "likelihood": likelihood_probabilities,
+    "gibbs": gibbs_probabilities,
+}
+
+
 if __name__ == "__main__":
     main()
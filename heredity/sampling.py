@@ -0,0 +1,351 @@
+import time
+
+import numpy as np
+
+from enumeration import Pedigree
+from factors import distributions, tables
+
+# Samples drawn when neither a count nor a time budget is given
+SAMPLES = 100000
+
+# Samples weighted at once by likelihood weighting
+BATCH = 1 << 12
+
+# Gibbs chains run side by side, and the sweeps each discards before
+# its samples count
+CHAINS = 32
+BURN = 50
+
+
+class SamplerStats():
+    """
+    Convergence diagnostics a sampler fills in as it runs: the samples
+    kept, how long they took, and after each batch or sweep the largest
+    change in any estimated probability since the last.
+
+    Likelihood weighting also records the effective sample size of its
+    weights, and Gibbs sampling the largest potential scale reduction
+    factor (R-hat) across its chains, which nears 1 as they agree.
+    """
+
+    def __init__(self):
+        self.samples = 0
+        self.seconds = 0
+        self.changes = []
+        self.effective_samples = None
+        self.rhat = None
+
+    def checkpoint(self, samples, change):
+        self.samples = samples
+        self.changes.append((samples, float(change)))
+
+    def as_dict(self):
+        return {
+            "samples": self.samples,
+            "seconds": self.seconds,
+            "changes": self.changes,
+            "effective_samples": self.effective_samples,
+            "rhat": self.rhat,
+        }
+
+
+def likelihood_weighting(people, probs, samples=None, seconds=None,
+                         seed=None, batch=BATCH, stats=None):
+    """
+    Returns every person's gene and trait distributions estimated by
+    likelihood weighting: genes are drawn from parents down, and each
+    draw is weighted by the chance of the known traits given them.
+
+    Sampling stops after `samples` samples or `seconds` seconds, or
+    SAMPLES samples if neither is given. The same `seed` always draws
+    the same samples. Weights are kept as logs relative to the largest
+    seen so far. Unknown traits are not drawn: their distributions
+    follow from the estimated genes.
+    """
+    pedigree = Pedigree(people)
+    rng = np.random.default_rng(seed)
+    founder, inherited, trait = tables(probs)
+    log_trait = np.log(trait)
+    levels = _levels(pedigree)
+    people_axis = np.arange(len(pedigree))
+    if stats is None:
+        stats = SamplerStats()
+
+    genes_total = np.zeros((len(pedigree), 3))
+    scale = -np.inf
+    weight = squares = 0
+    previous = None
+    drawn = 0
+    start = time.perf_counter()
+    for size in _batches(samples, seconds, batch, start):
+        genes = np.empty((size, len(pedigree)), dtype=np.int64)
+        genes[:, pedigree.founders] = _choose(
+            rng, np.broadcast_to(founder, (size, len(pedigree.founders), 3))
+        )
+        for level in levels:
+            genes[:, pedigree.children[level]] = _choose(rng, inherited[
+                genes[:, pedigree.mothers[level]],
+                genes[:, pedigree.fathers[level]]
+            ])
+        scores = log_trait[genes[:, pedigree.known],
+                           pedigree.observed].sum(axis=1)
+
+        top = scores.max()
+        if top > scale:
+            genes_total *= np.exp(scale - top)
+            weight *= np.exp(scale - top)
+            squares *= np.exp(2 * (scale - top))
+            scale = top
+        weights = np.exp(scores - scale)
+        np.add.at(genes_total, (people_axis, genes), weights[:, None])
+        weight += weights.sum()
+        squares += (weights ** 2).sum()
+
+        drawn += size
+        estimate = genes_total / genes_total.sum(axis=1, keepdims=True)
+        stats.checkpoint(drawn, _change(previous, estimate))
+        previous = estimate
+
+    stats.seconds = time.perf_counter() - start
+    stats.effective_samples = float(weight ** 2 / squares)
+    return _estimates(pedigree, genes_total, trait)
+
+
+def gibbs_sampling(people, probs, samples=None, seconds=None, seed=None,
+                   chains=CHAINS, burn=BURN, stats=None):
+    """
+    Returns every person's gene and trait distributions estimated by
+    Gibbs sampling: `chains` chains each redraw people's genes given
+    everyone else's, sweeping through the family in turn. People who
+    are not each other's parent, child or partner are redrawn together.
+
+    Sampling stops once the chains have kept `samples` samples between
+    them, rounded up to a whole sweep, or after `seconds` seconds, or
+    SAMPLES samples if neither is given. The first `burn` sweeps of
+    each chain are not kept. The same `seed` always draws the same
+    samples.
+
+    Unknown traits are summed out, so only genes are drawn, and each
+    estimate averages the conditional distributions drawn from rather
+    than the draws themselves. R-hat compares the chains' estimates.
+    """
+    pedigree = Pedigree(people)
+    n = len(pedigree)
+    rng = np.random.default_rng(seed)
+    founder, inherited, trait = tables(probs)
+    log_founder, log_inherited, log_trait = (
+        np.log(table) for table in (founder, inherited, trait)
+    )
+    # The same table, indexed by the other parent and the child first,
+    # for reading off the chances of each of a parent's genes
+    as_mother = log_inherited.transpose(1, 2, 0)
+    as_father = log_inherited.transpose(0, 2, 1)
+    log_tables = (log_founder, log_inherited, as_mother, as_father)
+    groups = _groups(pedigree, log_trait)
+    if stats is None:
+        stats = SamplerStats()
+
+    # Chains start from draws from the model, ignoring known traits
+    genes = np.empty((chains, n), dtype=np.int64)
+    genes[:, pedigree.founders] = _choose(
+        rng, np.broadcast_to(founder, (chains, len(pedigree.founders), 3))
+    )
+    for level in _levels(pedigree):
+        genes[:, pedigree.children[level]] = _choose(rng, inherited[
+            genes[:, pedigree.mothers[level]],
+            genes[:, pedigree.fathers[level]]
+        ])
+
+    conditionals = np.empty((chains, n, 3))
+    totals = np.zeros((chains, n, 3))
+    squares = np.zeros((chains, n, 3))
+    sweeps = 0
+    previous = None
+    start = time.perf_counter()
+    for _ in range(burn):
+        _sweep(rng, genes, conditionals, groups, log_tables)
+    for _ in _batches(samples, seconds, chains, start):
+        _sweep(rng, genes, conditionals, groups, log_tables)
+        totals += conditionals
+        squares += conditionals ** 2
+        sweeps += 1
+        estimate = totals.sum(axis=0) / (sweeps * chains)
+        stats.checkpoint(sweeps * chains, _change(previous, estimate))
+        previous = estimate
+
+    stats.seconds = time.perf_counter() - start
+    stats.rhat = _rhat(totals, squares, sweeps)
+    return _estimates(pedigree, totals.sum(axis=0), trait)
+
+
+def _sweep(rng, genes, conditionals, groups, tables):
+    """
+    Redraws the genes of each group of people in every chain in turn,
+    storing the distributions they were drawn from in `conditionals`.
+    """
+    log_founder, log_inherited, as_mother, as_father = tables
+    for members, founders, children, parents, mothered, fathered, \
+            evidence in groups:
+        scores = np.empty((len(genes), len(members), 3))
+        scores[:, founders] = log_founder
+        scores[:, children] = log_inherited[genes[:, parents[0]],
+                                            genes[:, parents[1]]]
+        for table, (slots, kids, partners) in ((as_mother, mothered),
+                                               (as_father, fathered)):
+            if len(slots):
+                np.add.at(scores, (slice(None), slots),
+                          table[genes[:, partners], genes[:, kids]])
+        scores += evidence
+        chances = np.exp(scores - scores.max(axis=2, keepdims=True))
+        chances /= chances.sum(axis=2, keepdims=True)
+        conditionals[:, members] = chances
+        genes[:, members] = _choose(rng, chances)
+
+
+def _groups(pedigree, log_trait):
+    """
+    Splits the family into groups no two of whom are parent and child
+    or parents of the same child, so each group's genes are independent
+    given everyone else's and can be redrawn at once.
+
+    Returns, for each group, its members; the positions in the group of
+    those without parents, and of those with them along with their
+    parents; the positions, children and other parents of the group's
+    mothers, and then of its fathers; and the log chances of each
+    member's known trait.
+    """
+    n = len(pedigree)
+    mothers = np.full(n, -1)
+    fathers = np.full(n, -1)
+    mothers[pedigree.children] = pedigree.mothers
+    fathers[pedigree.children] = pedigree.fathers
+    evidence = np.zeros((n, 3))
+    evidence[pedigree.known] = log_trait[:, pedigree.observed].T
+
+    linked = [set() for _ in range(n)]
+    for child, mother, father in zip(pedigree.children.tolist(),
+                                     pedigree.mothers.tolist(),
+                                     pedigree.fathers.tolist()):
+        for one, other in ((child, mother), (child, father),
+                           (mother, father)):
+            linked[one].add(other)
+            linked[other].add(one)
+
+    # Greedy colouring, giving everyone the first group none of their
+    # links are in yet
+    group_of = []
+    for person in range(n):
+        taken = {group_of[other] for other in linked[person]
+                 if other < person}
+        group = 0
+        while group in taken:
+            group += 1
+        group_of.append(group)
+
+    groups = []
+    group_of = np.array(group_of)
+    for group in range(group_of.max() + 1 if n else 0):
+        members = np.flatnonzero(group_of == group)
+        founders = np.flatnonzero(mothers[members] < 0)
+        children = np.flatnonzero(mothers[members] >= 0)
+        roles = []
+        for parents, partners in ((mothers, fathers), (fathers, mothers)):
+            slots, kids = [], []
+            for slot, person in enumerate(members.tolist()):
+                found = np.flatnonzero(parents == person)
+                slots.extend([slot] * len(found))
+                kids.extend(found.tolist())
+            kids = np.array(kids, dtype=np.int64)
+            roles.append((np.array(slots, dtype=np.int64), kids,
+                          partners[kids]))
+        groups.append((
+            members, founders, children,
+            (mothers[members[children]], fathers[members[children]]),
+            roles[0], roles[1], evidence[members],
+        ))
+    return groups
+
+
+def _levels(pedigree):
+    """
+    Returns positions in `pedigree.children` grouped by generation, so
+    everyone's parents come in an earlier group than they do.
+    """
+    remaining = np.arange(len(pedigree.children))
+    levels = []
+    while len(remaining):
+        # Children whose parents both have their depth settled
+        settled = np.ones(len(pedigree), dtype=bool)
+        settled[pedigree.children[remaining]] = False
+        ready = (settled[pedigree.mothers[remaining]]
+                 & settled[pedigree.fathers[remaining]])
+        if not ready.any():
+            raise ValueError("family has someone descended from themselves")
+        levels.append(remaining[ready])
+        remaining = remaining[~ready]
+    return levels
+
+
+def _batches(samples, seconds, size, start):
+    """
+    Yields the sizes of batches of up to `size` samples to draw, until
+    `samples` are drawn or `seconds` have passed since `start`. There is
+    always at least one batch.
+    """
+    if samples is None and seconds is None:
+        samples = SAMPLES
+    drawn = 0
+    while samples is None or drawn < samples:
+        if (seconds is not None and drawn
+                and time.perf_counter() - start >= seconds):
+            break
+        step = size if samples is None else min(size, samples - drawn)
+        yield step
+        drawn += step
+
+
+def _choose(rng, chances):
+    """
+    Draws an index along the last axis of `chances` for every entry
+    of the others.
+    """
+    drawn = (rng.random(chances.shape[:-1])[..., None]
+             > chances.cumsum(axis=-1)).sum(axis=-1)
+    # Rounding can leave the last cumulative chance just under 1
+    return np.minimum(drawn, chances.shape[-1] - 1)
+
+
+def _change(previous, estimate):
+    if previous is None:
+        return np.inf
+    return np.abs(estimate - previous).max()
+
+
+def _rhat(totals, squares, sweeps):
+    """
+    Returns the largest potential scale reduction factor over every
+    person's gene probabilities, from each chain's sums and sums of
+    squares over `sweeps` sweeps, or None with too little to compare.
+    """
+    if sweeps < 2 or len(totals) < 2:
+        return None
+    means = totals / sweeps
+    within = ((squares - sweeps * means ** 2) / (sweeps - 1)).mean(axis=0)
+    between = means.var(axis=0, ddof=1)
+    pooled = (sweeps - 1) / sweeps * within + between
+    varied = within > 1e-12
+    if not varied.any():
+        return 1.0
+    return float(np.sqrt(pooled[varied] / within[varied]).max())
+
+
+def _estimates(pedigree, genes_total, trait):
+    """
+    Returns the probabilities dictionary from weighted gene totals.
+    Unknown traits follow from each person's genes through the trait
+    table, and known ones are certain.
+    """
+    genes = genes_total / genes_total.sum(axis=1, keepdims=True)
+    traits = genes @ trait
+    traits[pedigree.known] = np.eye(2)[pedigree.observed]
+    return distributions(pedigree.people, genes, traits)
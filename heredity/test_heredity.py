@@ -0,0 +1,34 @@
+import os
+
+import pytest
+
+import heredity
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FAMILIES = ["family0.csv", "family1.csv", "family2.csv"]
+
+
+def assert_close(probabilities, expected, tolerance):
+    assert probabilities.keys() == expected.keys()
+    for person in expected:
+        for field in ("gene", "trait"):
+            for value, p in expected[person][field].items():
+                assert probabilities[person][field][value] == \
+                    pytest.approx(p, abs=tolerance), (person, field, value)
+
+
+@pytest.mark.parametrize("family", FAMILIES)
+@pytest.mark.parametrize("method", ["batch", "evidence", "eliminate"])
+def test_exact_methods(family, method):
+    people = heredity.load_data(os.path.join(HERE, "data", family))
+    expected = heredity.enumerate_probabilities(people)
+    probabilities = heredity.METHODS[method](people)
+    assert_close(probabilities, expected, 1e-9)
+
+
+@pytest.mark.parametrize("method", sorted(heredity.SAMPLERS))
+def test_samplers(method):
+    people = heredity.load_data(os.path.join(HERE, "data", "family2.csv"))
+    expected = heredity.eliminate_probabilities(people)
+    probabilities = heredity.SAMPLERS[method](people, 50000, seed=0)
+    assert_close(probabilities, expected, 0.02)
@@ -0,0 +1,419 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import pagerank
+from crawler import CACHE
+from matrix import LinkMatrix, SolverStats, SOLVERS, power_iteration
+
+# Laid out like the pages in the bundled corpora
+PAGE = """<!DOCTYPE html>
+<html lang="en">
+    <head>
+        <title>{name}</title>
+    </head>
+    <body>
+        <h1>{name}</h1>
+
+        <div>Links:</div>
+        <ul>
+{links}
+        </ul>
+    </body>
+</html>
+"""
+LINK = '            <li><a href="{name}.html">{name}</a></li>'
+
+SIZES = [1000, 10000, 100000, 1000000]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate synthetic web graphs and benchmark crawling "
+                    "them and computing their PageRank."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate = commands.add_parser(
+        "generate", help="write a corpus of linked HTML pages"
+    )
+    generate.add_argument("directory")
+    generate.add_argument("--pages", type=int, default=10000)
+    add_graph_arguments(generate)
+
+    run = commands.add_parser(
+        "run", help="time crawling a corpus and ranking its pages"
+    )
+    run.add_argument("corpus", nargs="?",
+                     help="directory of HTML pages to crawl")
+    run.add_argument("--pages", type=int,
+                     help="rank a generated graph of this many pages "
+                          "instead, skipping the crawl")
+    add_graph_arguments(run)
+    add_run_arguments(run)
+    run.add_argument("--output", help="write the results to this JSON file")
+
+    suite = commands.add_parser(
+        "suite", help="run the benchmark over a range of graph sizes"
+    )
+    suite.add_argument("--sizes", type=int, nargs="+", default=SIZES,
+                       help="numbers of pages to benchmark")
+    suite.add_argument("--html", metavar="DIRECTORY",
+                       help="write and crawl corpora here rather than "
+                            "ranking the graphs in memory")
+    add_graph_arguments(suite)
+    add_run_arguments(suite)
+    suite.add_argument("--output", help="write the results to this JSON file")
+
+    compare = commands.add_parser(
+        "compare", help="compare the results of two runs or suites"
+    )
+    compare.add_argument("baseline")
+    compare.add_argument("candidate")
+
+    args = parser.parse_args()
+    if args.command == "generate":
+        offsets, targets = generate_graph(args.pages, args.links, args.alpha,
+                                          args.dangling, args.seed)
+        write_corpus(args.directory, offsets, targets)
+        print(f"Wrote {args.pages} pages with {len(targets)} links "
+              f"to {args.directory}.")
+    elif args.command == "run":
+        if (args.corpus is None) == (args.pages is None):
+            parser.error("run needs either a corpus or --pages")
+        results = run_benchmark(args)
+        print(json.dumps(results, indent=2))
+        write_results(args.output, results)
+    elif args.command == "suite":
+        results = run_suite(args)
+        write_results(args.output, results)
+    else:
+        compare_results(args.baseline, args.candidate)
+
+
+def add_graph_arguments(parser):
+    parser.add_argument("--links", type=float, default=8,
+                        help="mean number of links on pages that have any")
+    parser.add_argument("--alpha", type=float, default=2.1,
+                        help="power-law exponent of links per page")
+    parser.add_argument("--dangling", type=float, default=0.1,
+                        help="fraction of pages without links")
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def add_run_arguments(parser):
+    parser.add_argument("--samples", type=int, default=pagerank.SAMPLES,
+                        help="number of samples for sample_pagerank")
+    parser.add_argument("--solver", choices=sorted(SOLVERS),
+                        default="jacobi")
+    parser.add_argument("--tolerance", type=float,
+                        default=pagerank.TOLERANCE)
+    parser.add_argument("--cold", action="store_true",
+                        help="clear the link cache before crawling")
+    parser.add_argument("--label", help="name for this run in the results")
+
+
+def generate_graph(pages, links=8, alpha=2.1, dangling=0.1, seed=0):
+    """
+    Returns CSR arrays (offsets, targets) of a synthetic web graph of
+    `pages` pages: the pages linked to by page i are numbered
+    `targets[offsets[i]:offsets[i + 1]]`.
+
+    A `dangling` fraction of pages have no links. The rest have a number
+    of links following a power law with exponent `alpha` and mean about
+    `links`, so most pages link to a few others and a few to hundreds.
+    Links favour popular pages the same way. Like real pages, some link
+    to themselves or to the same page twice, which crawl leaves out.
+    """
+    rng = np.random.default_rng(seed)
+    scale = links * (alpha - 1) / alpha
+    degrees = np.floor(scale * (rng.pareto(alpha, pages) + 1))
+    degrees = np.minimum(degrees, pages).astype(np.int64)
+    degrees[rng.random(pages) < dangling] = 0
+    offsets = np.zeros(pages + 1, dtype=np.int64)
+    np.cumsum(degrees, out=offsets[1:])
+
+    # The square of a uniform draw favours low ranks of popularity,
+    # which are dealt out to pages at random
+    popular = rng.permutation(pages)
+    chosen = (pages * rng.random(offsets[-1]) ** 2).astype(np.int64)
+    return offsets, popular[chosen]
+
+
+def write_corpus(directory, offsets, targets):
+    """
+    Writes the graph in CSR arrays (offsets, targets) to `directory` as
+    HTML pages named 0.html, 1.html and so on.
+    """
+    os.makedirs(directory, exist_ok=True)
+    offsets, targets = offsets.tolist(), targets.tolist()
+    for page in range(len(offsets) - 1):
+        links = "\n".join(
+            LINK.format(name=target)
+            for target in targets[offsets[page]:offsets[page + 1]]
+        )
+        with open(os.path.join(directory, f"{page}.html"), "w",
+                  encoding="utf-8") as f:
+            f.write(PAGE.format(name=page, links=links))
+
+
+def graph_corpus(offsets, targets):
+    """
+    Returns the graph in CSR arrays (offsets, targets) as a corpus
+    dictionary, leaving out links as crawl does.
+    """
+    offsets, targets = offsets.tolist(), targets.tolist()
+    names = [f"{page}.html" for page in range(len(offsets) - 1)]
+    corpus = {}
+    for page, name in enumerate(names):
+        linked = set(targets[offsets[page]:offsets[page + 1]])
+        linked.discard(page)
+        corpus[name] = set(names[target] for target in linked)
+    return corpus
+
+
+def run_benchmark(args):
+    """
+    Crawls `args.corpus`, or generates a graph of `args.pages` pages,
+    then times iterate_pagerank and sample_pagerank on it, returning the
+    timings and their errors as a JSON-ready dict.
+
+    Errors are against power iteration run to a tolerance of 1e-12.
+    """
+    results = {
+        "label": args.label,
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "corpus": args.corpus,
+        "seed": args.seed,
+    }
+    rss = {}
+
+    if args.corpus is None:
+        corpus = graph_corpus(*generate_graph(
+            args.pages, args.links, args.alpha, args.dangling, args.seed
+        ))
+        results["crawl"] = None
+    else:
+        if args.cold:
+            try:
+                os.remove(os.path.join(args.corpus, CACHE))
+            except FileNotFoundError:
+                pass
+        size = sum(
+            entry.stat().st_size for entry in os.scandir(args.corpus)
+            if entry.name.endswith(".html")
+        )
+        start = time.perf_counter()
+        corpus = pagerank.crawl(args.corpus)
+        seconds = time.perf_counter() - start
+        results["crawl"] = {
+            "cold": args.cold,
+            "s": seconds,
+            "pages_per_s": len(corpus) / seconds,
+            "mb_per_s": size / 2 ** 20 / seconds,
+        }
+        rss["crawl"] = peak_rss() / 2 ** 20
+
+    results["pages"] = len(corpus)
+    results["links"] = sum(len(links) for links in corpus.values())
+    results["dangling"] = sum(not links for links in corpus.values())
+
+    matrix = LinkMatrix.from_corpus(corpus)
+    reference, _ = power_iteration(matrix, pagerank.DAMPING, 1e-12)
+
+    stats = SolverStats()
+    start = time.perf_counter()
+    ranks = pagerank.iterate_pagerank(corpus, pagerank.DAMPING,
+                                      args.tolerance, args.solver, stats)
+    seconds = time.perf_counter() - start
+    results["iterate"] = {
+        "solver": args.solver,
+        "tolerance": args.tolerance,
+        "s": seconds,
+        "iterations": stats.iterations,
+        "iteration_ms": percentiles(stats.as_dict()["sweep_ms"]),
+        "error": errors(matrix, ranks, reference),
+    }
+    rss["iterate"] = peak_rss() / 2 ** 20
+
+    random.seed(args.seed)
+    start = time.perf_counter()
+    ranks = pagerank.sample_pagerank(corpus, pagerank.DAMPING, args.samples)
+    seconds = time.perf_counter() - start
+    results["sample"] = {
+        "samples": args.samples,
+        "s": seconds,
+        "samples_per_s": args.samples / seconds,
+        "error": errors(matrix, ranks, reference),
+    }
+    rss["sample"] = peak_rss() / 2 ** 20
+
+    # Peaks so far after each stage, as the process never gives
+    # memory back
+    results["peak_rss_mb"] = rss
+    return results
+
+
+def run_suite(args):
+    """
+    Runs the benchmark for each of `args.sizes` in a process of its
+    own, so each size's memory is measured on its own, printing a
+    summary line as each finishes. Returns the list of results.
+    """
+    print(f"{'pages':>9} {'crawl p/s':>11} {'iter ms':>9} {'iters':>6} "
+          f"{'samples/s':>11} {'iter L1':>10} {'sample L1':>10} "
+          f"{'peak MB':>9}")
+    suite = []
+    for pages in args.sizes:
+        command = [sys.executable, os.path.abspath(__file__), "run"]
+        if args.html:
+            corpus = os.path.join(args.html, f"pages{pages}")
+            if not os.path.isdir(corpus):
+                write_corpus(corpus, *generate_graph(
+                    pages, args.links, args.alpha, args.dangling, args.seed
+                ))
+            command.append(corpus)
+        else:
+            command.extend(["--pages", str(pages)])
+        command.extend([
+            "--links", str(args.links), "--alpha", str(args.alpha),
+            "--dangling", str(args.dangling), "--seed", str(args.seed),
+            "--samples", str(args.samples), "--solver", args.solver,
+            "--tolerance", str(args.tolerance),
+        ])
+        if args.cold:
+            command.append("--cold")
+        if args.label:
+            command.extend(["--label", args.label])
+
+        with tempfile.TemporaryDirectory() as scratch:
+            output = os.path.join(scratch, "results.json")
+            subprocess.run(command + ["--output", output], check=True,
+                           stdout=subprocess.DEVNULL)
+            with open(output, encoding="utf-8") as f:
+                results = json.load(f)
+        suite.append(results)
+
+        crawl = results["crawl"]
+        print(f"{results['pages']:9d} "
+              f"{crawl['pages_per_s'] if crawl else float('nan'):11.0f} "
+              f"{results['iterate']['iteration_ms']['p50']:9.3f} "
+              f"{results['iterate']['iterations']:6d} "
+              f"{results['sample']['samples_per_s']:11.0f} "
+              f"{results['iterate']['error']['l1']:10.2e} "
+              f"{results['sample']['error']['l1']:10.2e} "
+              f"{max(results['peak_rss_mb'].values()):9.1f}")
+    return suite
+
+
+def errors(matrix, ranks, reference):
+    """
+    Returns the L1 and largest differences between the PageRank
+    dictionary `ranks` and the `reference` values of `matrix`'s pages.
+    """
+    difference = np.abs(
+        np.array([ranks[page] for page in matrix.pages]) - reference
+    )
+    return {"l1": float(difference.sum()), "max": float(difference.max())}
+
+
+# Each project runs on its own from its directory, so this and
+# peak_rss are kept in step with the copies in degrees/benchmark.py
+# rather than shared.
+def percentiles(values):
+    """
+    Returns the mean, median, 90th and 99th percentiles and maximum of
+    `values`.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    result = {"mean": sum(ordered) / len(ordered)}
+    for percentile in (50, 90, 99):
+        result[f"p{percentile}"] = ordered[
+            min(len(ordered) - 1, len(ordered) * percentile // 100)
+        ]
+    result["max"] = ordered[-1]
+    return result
+
+
+def peak_rss():
+    """
+    Returns the most memory this process has held at once, in bytes.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def write_results(path, results):
+    if path:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+
+
+def compare_results(baseline, candidate):
+    """
+    Prints how each measurement in the `candidate` results file changed
+    relative to the `baseline` one, matching suite runs by page count.
+    """
+    with open(baseline, encoding="utf-8") as f:
+        before = json.load(f)
+    with open(candidate, encoding="utf-8") as f:
+        after = json.load(f)
+    if isinstance(before, dict):
+        before = [before]
+    if isinstance(after, dict):
+        after = [after]
+    candidates = {results["pages"]: results for results in after}
+
+    print(f"{'':32}{before[0].get('label') or baseline:>14}"
+          f"{after[0].get('label') or candidate:>14}")
+    for old_results in before:
+        new_results = candidates.get(old_results["pages"])
+        if new_results is None:
+            continue
+        print(f"{old_results['pages']} pages")
+        for name, old, new in comparable_rows(old_results, new_results):
+            change = f"{(new - old) / old:+.1%}" if old else ""
+            print(f"  {name:30}{old:14.4g}{new:14.4g}  {change}")
+
+
+def comparable_rows(before, after):
+    """
+    Returns (name, before, after) for each measurement both results
+    have.
+    """
+    rows = []
+    if before["crawl"] and after["crawl"]:
+        rows.append(("crawl pages_per_s", before["crawl"]["pages_per_s"],
+                     after["crawl"]["pages_per_s"]))
+    for key in ("p50", "p90"):
+        rows.append((f"iterate iteration_ms {key}",
+                     before["iterate"]["iteration_ms"][key],
+                     after["iterate"]["iteration_ms"][key]))
+    for stage in ("iterate", "sample"):
+        rows.append((f"{stage} s", before[stage]["s"], after[stage]["s"]))
+        rows.append((f"{stage} error l1", before[stage]["error"]["l1"],
+                     after[stage]["error"]["l1"]))
+    rows.append(("sample samples_per_s", before["sample"]["samples_per_s"],
+                 after["sample"]["samples_per_s"]))
+    rows.append(("peak_rss_mb", max(before["peak_rss_mb"].values()),
+                 max(after["peak_rss_mb"].values())))
+    return rows
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import concurrent.futures
+import itertools
+import json
+import os
+import re
+
+import numpy as np
+
+from matrix import LinkMatrix
+
+# Matched against raw bytes, so pages never need decoding in full
+LINK = re.compile(rb"<a\s+(?:[^>]*?)href=\"([^\"]*)\"")
+
+# Links extracted from each page, kept in the corpus directory and keyed
+# by each page's modification time and size
+CACHE = ".links.json"
+VERSION = 2
+
+# Pages read by each task on the thread pool
+CHUNK = 256
+
+
+def crawl_index(directory, workers=None):
+    """
+    Parse a directory of HTML pages into an interned link graph.
+
+    Return the sorted page names, and CSR arrays of the links between
+    them: the pages linked to by page i are numbered
+    `targets[offsets[i]:offsets[i + 1]]`. As in `crawl`, links to the
+    page itself or to pages outside the corpus are left out.
+
+    Only pages added or changed since the last crawl are read, on a
+    pool of `workers` threads.
+    """
+    cache = _load_cache(directory)
+    cached = cache.get("pages", {})
+    entries = {}
+    stale = []
+    with os.scandir(directory) as scan:
+        for entry in scan:
+            if not entry.name.endswith(".html"):
+                continue
+            stat = entry.stat()
+            key = [stat.st_mtime_ns, stat.st_size]
+            if cached.get(entry.name, [None, None])[:2] == key:
+                entries[entry.name] = cached[entry.name]
+            else:
+                stale.append((entry.name, key))
+
+    paths = [os.path.join(directory, name) for name, _ in stale]
+    chunks = [paths[i:i + CHUNK] for i in range(0, len(paths), CHUNK)]
+    with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+        extracted = itertools.chain.from_iterable(
+            executor.map(extract_links, chunks)
+        )
+        for (name, key), links in zip(stale, extracted):
+            entries[name] = key + [links]
+
+    pages = sorted(entries)
+    if cache and not stale and len(entries) == len(cached):
+        offsets, targets = cache["graph"]
+        return (pages, np.array(offsets, dtype=np.int64),
+                np.array(targets, dtype=np.int64))
+
+    index = {page: i for i, page in enumerate(pages)}
+    offsets = [0]
+    targets = []
+    for i, page in enumerate(pages):
+        # Links outside the corpus map to the page itself, then go with it
+        linked = {index.get(link, i) for link in entries[page][2]}
+        linked.discard(i)
+        targets.extend(sorted(linked))
+        offsets.append(len(targets))
+    _save_cache(directory, entries, offsets, targets)
+    return (pages, np.array(offsets, dtype=np.int64),
+            np.array(targets, dtype=np.int64))
+
+
+def crawl_matrix(directory, workers=None):
+    """
+    Returns the LinkMatrix of the HTML pages in `directory`.
+    """
+    return LinkMatrix(*crawl_index(directory, workers))
+
+
+def extract_links(paths):
+    """
+    Returns every link target in each of the HTML files at `paths`.
+    """
+    links = []
+    for path in paths:
+        with open(path, "rb") as f:
+            contents = f.read()
+        links.append([
+            link.decode("utf-8", "replace")
+            for link in set(LINK.findall(contents))
+        ])
+    return links
+
+
+def _load_cache(directory):
+    try:
+        with open(os.path.join(directory, CACHE), encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if cache.get("version") != VERSION:
+        return {}
+    return cache
+
+
+def _save_cache(directory, entries, offsets, targets):
+    """
+    Writes the extracted links, and the graph they make, to the cache
+    if the directory allows.
+    """
+    path = os.path.join(directory, CACHE)
+    temporary = f"{path}.tmp"
+    try:
+        with open(temporary, "w", encoding="utf-8") as f:
+            f.write(json.dumps({
+                "version": VERSION,
+                "pages": entries,
+                "graph": [offsets, targets],
+            }))
+        os.replace(temporary, path)
+    except OSError:
+        pass
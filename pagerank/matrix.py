@@ -0,0 +1,462 @@
+import collections
+import time
+
+import numpy as np
+import scipy.sparse
+
+
+class LinkMatrix():
+    """
+    The link structure of a corpus as a sparse matrix in CSR form.
+
+    Pages are numbered in sorted order. The links out of page i are
+    `targets[offsets[i]:offsets[i + 1]]`. Pages with no links out are
+    dangling: a surfer on one jumps to any page at random, which is
+    handled as a rank-one correction instead of N stored links each.
+    """
+
+    def __init__(self, pages, offsets, targets):
+        self.pages = pages
+        self.index = {page: i for i, page in enumerate(pages)}
+        self.offsets = offsets
+        self.targets = targets
+        self.out_degree = np.diff(offsets)
+        self.dangling = self.out_degree == 0
+        self.incoming = None
+
+    @classmethod
+    def from_corpus(cls, corpus):
+        """
+        Builds the matrix for a corpus as returned by `crawl`.
+        """
+        pages = sorted(corpus)
+        index = {page: i for i, page in enumerate(pages)}
+        offsets = np.zeros(len(pages) + 1, dtype=np.int64)
+        targets = []
+        for i, page in enumerate(pages):
+            targets.extend(sorted(index[link] for link in corpus[page]))
+            offsets[i + 1] = len(targets)
+        return cls(pages, offsets, np.array(targets, dtype=np.int64))
+
+    def __len__(self):
+        return len(self.pages)
+
+    def changed(self, changes):
+        """
+        Returns the matrix after `changes`, which maps each added or
+        edited page to the set of pages it now links to, or to None if
+        it was removed.
+
+        Other pages keep their order, and their links are carried over
+        as arrays, so the cost grows with the number of changes rather
+        than the number of pages. Added pages are numbered last.
+        """
+        n = len(self.pages)
+        kept = np.ones(n, dtype=bool)
+        kept[[self.index[page] for page, links in changes.items()
+              if links is None and page in self.index]] = False
+        pages = [page for page, keep in zip(self.pages, kept.tolist())
+                 if keep]
+        pages += sorted(page for page, links in changes.items()
+                        if links is not None and page not in self.index)
+        index = {page: i for i, page in enumerate(pages)}
+
+        # Renumber the links of unedited pages, dropping removed pages
+        renumber = np.cumsum(kept) - 1
+        renumber[~kept] = -1
+        unedited = kept.copy()
+        unedited[[self.index[page] for page in changes
+                  if page in self.index]] = False
+        rows = np.repeat(np.arange(n), self.out_degree)
+        targets = renumber[self.targets]
+        carried = unedited[rows] & (targets >= 0)
+        rows, targets = renumber[rows[carried]], targets[carried]
+
+        edited_rows, edited_targets = [], []
+        for page, links in changes.items():
+            if links is None:
+                continue
+            row = index[page]
+            linked = set(index[link] for link in links if link in index)
+            linked.discard(row)
+            edited_rows += [row] * len(linked)
+            edited_targets += sorted(linked)
+        rows = np.concatenate([rows, np.array(edited_rows, dtype=np.int64)])
+        targets = np.concatenate([targets,
+                                  np.array(edited_targets, dtype=np.int64)])
+
+        order = np.argsort(rows, kind="stable")
+        offsets = np.zeros(len(pages) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=len(pages)), out=offsets[1:])
+        return LinkMatrix(pages, offsets, targets[order])
+
+    def step(self, ranks, damping_factor):
+        """
+        Returns the ranks after one more step of the random surfer,
+        starting from the probability vector `ranks`.
+        """
+        n = len(self.pages)
+        # Each page splits its rank evenly over its links...
+        shares = np.divide(ranks, self.out_degree,
+                           out=np.zeros(n), where=~self.dangling)
+        linked = np.bincount(self.targets,
+                             weights=np.repeat(shares, self.out_degree),
+                             minlength=n)
+        # ...while dangling pages and random jumps spread over every page
+        spread = (damping_factor * ranks[self.dangling].sum()
+                  + (1 - damping_factor) * ranks.sum()) / n
+        return damping_factor * linked + spread
+
+    def step_personalized(self, ranks, teleports, damping_factor):
+        """
+        Like `step`, for a matrix with one column of ranks per surfer,
+        where each surfer's random jumps land on the pages of its own
+        column of `teleports`, a sparse matrix, rather than on any page.
+
+        A surfer on a dangling page jumps in the same way.
+        """
+        jumps = (damping_factor * ranks[self.dangling].sum(axis=0)
+                 + (1 - damping_factor) * ranks.sum(axis=0))
+        updated = self.transposed() @ ranks
+        updated *= damping_factor
+        # Teleport vectors are sparse, so only their pages need adding to
+        updated[teleports.row, teleports.col] += (
+            teleports.data * jumps[teleports.col]
+        )
+        return updated
+
+    def transposed(self):
+        """
+        Returns the links into each page as a SciPy sparse matrix, each
+        weighted by the share of its source page's rank it carries.
+        """
+        if self.incoming is None:
+            shares = np.repeat(1 / np.maximum(self.out_degree, 1),
+                               self.out_degree)
+            n = len(self.pages)
+            self.incoming = scipy.sparse.csr_matrix(
+                (shares, self.targets, self.offsets), shape=(n, n)
+            ).T.tocsr()
+        return self.incoming
+
+    def as_dict(self, ranks):
+        """
+        Returns `ranks` as a dictionary from page name to rank.
+        """
+        return dict(zip(self.pages, ranks.tolist()))
+
+
+class SolverStats():
+    """
+    Convergence telemetry a solver fills in as it runs: the number of
+    sweeps, the L1 residual after each one, and how long each took.
+    """
+
+    def __init__(self):
+        self.iterations = 0
+        self.residuals = []
+        self.sweep_times = []
+
+    def sweep(self, residual, seconds):
+        self.iterations += 1
+        self.residuals.append(float(residual))
+        self.sweep_times.append(seconds)
+
+    def as_dict(self):
+        return {
+            "iterations": self.iterations,
+            "residuals": self.residuals,
+            "sweep_ms": [seconds * 1000 for seconds in self.sweep_times],
+            "total_ms": sum(self.sweep_times) * 1000,
+        }
+
+
+def power_iteration(matrix, damping_factor, tolerance, max_iterations=1000,
+                    ranks=None, stats=None):
+    """
+    Steps the random surfer from `ranks`, or the uniform distribution,
+    until the ranks change by at most `tolerance` in L1 norm, returning
+    the ranks and the number of steps taken.
+
+    This is the Jacobi method: every page is updated from the previous
+    sweep's ranks. Pass a SolverStats as `stats` to read back how it
+    converged.
+    """
+    n = len(matrix)
+    if ranks is None:
+        ranks = np.full(n, 1 / n)
+    if stats is None:
+        stats = SolverStats()
+    for iteration in range(1, max_iterations + 1):
+        start = time.perf_counter()
+        updated = matrix.step(ranks, damping_factor)
+        change = np.abs(updated - ranks).sum()
+        ranks = updated
+        stats.sweep(change, time.perf_counter() - start)
+        if change <= tolerance:
+            break
+    return ranks, iteration
+
+
+def gauss_seidel(matrix, damping_factor, tolerance, max_iterations=1000,
+                 ranks=None, stats=None, blocks=64):
+    """
+    Like `power_iteration`, but sweeps the pages in `blocks` blocks,
+    each updated from the ranks already updated earlier in the sweep.
+    Stops once a sweep changes the ranks by at most `tolerance` in L1
+    norm.
+    """
+    n = len(matrix)
+    ranks = np.full(n, 1 / n) if ranks is None else ranks.copy()
+    if stats is None:
+        stats = SolverStats()
+    bounds = np.unique(np.linspace(0, n, blocks + 1).astype(np.int64))
+    rows = [
+        (low, high, matrix.transposed()[low:high])
+        for low, high in zip(bounds[:-1].tolist(), bounds[1:].tolist())
+    ]
+    for iteration in range(1, max_iterations + 1):
+        start = time.perf_counter()
+        ranks /= ranks.sum()
+
+        # Random jumps and dangling pages spread rank evenly, so their
+        # share only needs adjusting as dangling pages change
+        dangling_mass = ranks[matrix.dangling].sum()
+        change = 0
+        for low, high, incoming in rows:
+            updated = (damping_factor * (incoming @ ranks)
+                       + (damping_factor * dangling_mass
+                          + 1 - damping_factor) / n)
+            moved = updated - ranks[low:high]
+            change += np.abs(moved).sum()
+            dangling_mass += moved[matrix.dangling[low:high]].sum()
+            ranks[low:high] = updated
+        stats.sweep(change, time.perf_counter() - start)
+        if change <= tolerance:
+            break
+    return ranks / ranks.sum(), iteration
+
+
+def anderson(matrix, damping_factor, tolerance, max_iterations=1000,
+             ranks=None, stats=None, memory=5):
+    """
+    Like `power_iteration`, but with Anderson acceleration: each new
+    guess is the combination of the last `memory` steps whose residuals
+    best cancel out, found by least squares.
+    """
+    n = len(matrix)
+    if ranks is None:
+        ranks = np.full(n, 1 / n)
+    if stats is None:
+        stats = SolverStats()
+    # Differences between successive steps and between their residuals
+    step_changes = collections.deque(maxlen=memory)
+    residual_changes = collections.deque(maxlen=memory)
+    previous = None
+    for iteration in range(1, max_iterations + 1):
+        start = time.perf_counter()
+        stepped = matrix.step(ranks, damping_factor)
+        residual = stepped - ranks
+        size = np.abs(residual).sum()
+        if size <= tolerance:
+            stats.sweep(size, time.perf_counter() - start)
+            ranks = stepped
+            break
+
+        if previous is not None:
+            step_changes.append(stepped - previous[0])
+            residual_changes.append(residual - previous[1])
+        previous = stepped, residual
+        if step_changes:
+            weights = np.linalg.lstsq(np.column_stack(residual_changes),
+                                      residual, rcond=None)[0]
+            ranks = stepped - np.column_stack(step_changes) @ weights
+            # Keep the guess a probability distribution
+            np.clip(ranks, 0, None, out=ranks)
+            ranks /= ranks.sum()
+        else:
+            ranks = stepped
+        stats.sweep(size, time.perf_counter() - start)
+    return ranks, iteration
+
+
+SOLVERS = {
+    "jacobi": power_iteration,
+    "gauss-seidel": gauss_seidel,
+    "anderson": anderson,
+}
+
+
+def personalized_iteration(matrix, seeds, damping_factor, tolerance,
+                           max_iterations=1000, block=64):
+    """
+    Computes personalized PageRank for each list of page numbers in
+    `seeds`, returning an array with one column of ranks per seed list
+    and the number of steps the slowest column took.
+
+    A personalized surfer's random jumps land only on its seed pages,
+    chosen evenly. Up to `block` seed lists are stepped together, with
+    one sparse product per step covering them all. Each column stops
+    once its ranks change by at most `tolerance` in L1 norm.
+
+    Raises ValueError if a seed list is empty or names a page number
+    outside the matrix.
+    """
+    n = len(matrix)
+    for pages in seeds:
+        if not len(pages):
+            raise ValueError("every seed list needs at least one page")
+        if not all(0 <= page < n for page in pages):
+            raise ValueError(f"seed pages must be numbered 0 to {n - 1}")
+    ranks = np.empty((n, len(seeds)))
+    slowest = 0
+    for first in range(0, len(seeds), block):
+        group = seeds[first:first + block]
+        columns = np.arange(first, first + len(group))
+        pages = [np.unique(pages) for pages in group]
+        teleports = scipy.sparse.csc_matrix((
+            np.concatenate([np.full(len(p), 1 / len(p)) for p in pages]),
+            np.concatenate(pages),
+            np.cumsum([0] + [len(p) for p in pages]),
+        ), shape=(n, len(group)))
+
+        current = teleports.toarray()
+        for iteration in range(1, max_iterations + 1):
+            updated = matrix.step_personalized(current, teleports.tocoo(),
+                                               damping_factor)
+            current -= updated
+            np.abs(current, out=current)
+            moving = current.sum(axis=0) > tolerance
+            current = updated
+            if not moving.all():
+                ranks[:, columns[~moving]] = current[:, ~moving]
+                current, columns = current[:, moving], columns[moving]
+                teleports = teleports[:, moving]
+            if not len(columns):
+                break
+        ranks[:, columns] = current
+        slowest = max(slowest, iteration)
+    return ranks, slowest
+
+
+def push_iteration(matrix, damping_factor, ranks, tolerance,
+                   max_rounds=1000):
+    """
+    Refines `ranks`, already close to the PageRank of `matrix`, until
+    its residual is at most `tolerance` in L1 norm, returning the ranks
+    and the number of rounds taken.
+
+    The residual is how far each page's rank is from what its in-links
+    and the random jumps give it. Each round pushes the pages whose
+    residual is over `tolerance` / N, moving it into their rank and
+    passing it on down their links, and only the pages those links reach
+    are checked for the next round. After a small edit the residual sits
+    near the edited pages, so most pages and links are never touched.
+
+    A residual spread evenly over every page only scales the ranks, which
+    the final normalization undoes. So the even part of the starting
+    residual, its median, is set aside, and so is the residual dangling
+    pages pass on to every page.
+    """
+    n = len(matrix)
+    ranks = ranks.copy()
+    residual = (matrix.step(ranks, damping_factor) - ranks
+                + (1 - damping_factor) * (1 - ranks.sum()) / n)
+    residual -= np.median(residual)
+    threshold = tolerance / n
+    active = np.flatnonzero(np.abs(residual) > threshold)
+    rounds = 0
+    while len(active) and rounds < max_rounds:
+        rounds += 1
+        mass = residual[active]
+        ranks[active] += mass
+        residual[active] = 0
+
+        linking = ~matrix.dangling[active]
+        pushed, mass = active[linking], mass[linking]
+        degree = matrix.out_degree[pushed]
+        starts = np.repeat(matrix.offsets[pushed] - np.cumsum(degree)
+                           + degree, degree)
+        links = matrix.targets[starts + np.arange(degree.sum())]
+        shares = np.repeat(damping_factor * mass / degree, degree)
+        reached, position = np.unique(links, return_inverse=True)
+        residual[reached] += np.bincount(position, weights=shares,
+                                         minlength=len(reached))
+        active = reached[np.abs(residual[reached]) > threshold]
+    return ranks / ranks.sum(), rounds
+
+
+def update_ranks(matrix, ranks, changes, damping_factor, tolerance,
+                 push=False):
+    """
+    Applies `changes` to `matrix` as LinkMatrix.changed does, and brings
+    its PageRank vector `ranks` up to date by iterating from the old
+    values rather than from scratch, with push_iteration if `push` is
+    set. Returns the changed matrix, its ranks and the steps taken.
+    """
+    updated = matrix.changed(changes)
+    # Carried-over pages keep their order; added pages start from an
+    # even share
+    start = np.full(len(updated), 1 / len(updated))
+    carried = np.array([page in updated.index for page in matrix.pages],
+                       dtype=bool)
+    start[:carried.sum()] = ranks[carried]
+    start /= start.sum()
+    if push:
+        ranks, steps = push_iteration(updated, damping_factor, start,
+                                      tolerance)
+    else:
+        ranks, steps = power_iteration(updated, damping_factor, tolerance,
+                                       ranks=start)
+    return updated, ranks, steps
+
+
+def random_walk(matrix, damping_factor, n, rng, batch=1 << 18):
+    """
+    Walks the random surfer for `n` steps from a random page, returning
+    how many times each page was visited.
+
+    Every random jump lands on a page drawn uniformly, whatever came
+    before, so the walk splits into independent excursions, each
+    starting with a jump and following links until the next one. Up to
+    `batch` excursions are walked side by side, one vectorized step at a
+    time, and laid end to end until they cover `n` steps. A step costs
+    O(1): the next link is found by offset into the CSR arrays. Random
+    draws come from the NumPy generator `rng`.
+
+    No excursion is walked past `n` steps, so a walk still ends when
+    `damping_factor` is 1 and no page is dangling.
+    """
+    size = len(matrix)
+    visits = np.zeros(size, dtype=np.int64)
+    remaining = n
+    while remaining > 0:
+        # Excursions last 1 / (1 - damping_factor) steps on average
+        lanes = min(batch, int(remaining * (1 - damping_factor)) + 1)
+        pages = rng.integers(size, size=lanes)
+        active = np.arange(lanes)
+        visited, lanes_of, depths = [], [], []
+        depth = 0
+        # Steps deeper than `remaining` would be cut off below anyway
+        while len(active) and depth < remaining:
+            visited.append(pages)
+            lanes_of.append(active)
+            depths.append(np.full(len(active), depth))
+            degree = matrix.out_degree[pages]
+            follow = (rng.random(len(pages)) < damping_factor) & (degree > 0)
+            pages, degree = pages[follow], degree[follow]
+            active = active[follow]
+            choice = (rng.random(len(pages)) * degree).astype(np.int64)
+            pages = matrix.targets[matrix.offsets[pages] + choice]
+            depth += 1
+
+        visited = np.concatenate(visited)
+        lanes_of = np.concatenate(lanes_of)
+        # Keep only the steps that fall within the first `remaining`
+        # once the excursions are laid end to end
+        lengths = np.bincount(lanes_of, minlength=lanes)
+        starts = np.cumsum(lengths) - lengths
+        kept = starts[lanes_of] + np.concatenate(depths) < remaining
+        visits += np.bincount(visited[kept], minlength=size)
+        remaining -= min(remaining, len(visited))
+    return visits
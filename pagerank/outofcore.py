@@ -0,0 +1,324 @@
+import argparse
+import hashlib
+import heapq
+import itertools
+import json
+import os
+import time
+from array import array
+
+import numpy as np
+
+from crawler import CHUNK, extract_links
+from matrix import SolverStats
+from pagerank import DAMPING, TOLERANCE
+
+# Edge files for a corpus live in this directory inside it. Edges are
+# pairs of int32 page numbers (source, target), sorted by target then
+# source; pages are numbered in sorted order, as in LinkMatrix.
+EDGES = ".edges"
+VERSION = 3
+
+# Edges, links or page names held in memory at once
+BLOCK = 1 << 20
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compute PageRank for a corpus too large for memory, "
+                    "streaming its links from a binary edge file."
+    )
+    parser.add_argument("corpus")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE,
+                        help="L1 residual to stop at")
+    parser.add_argument("--block", type=int, default=BLOCK,
+                        help="edges, links or page names to hold in "
+                             "memory at once")
+    parser.add_argument("--top", type=int, default=20,
+                        help="number of top-ranked pages to print")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    path = edge_directory(args.corpus, args.block)
+    print(f"Edge file ready in {time.perf_counter() - start:.2f}s.")
+
+    stats = SolverStats()
+    ranks = iterate_edges(path, DAMPING, args.tolerance, args.block,
+                          stats=stats)
+    print(f"Converged in {stats.iterations} iterations, "
+          f"{sum(stats.sweep_times):.2f}s.")
+
+    top = top_pages(ranks, args.top, args.block).tolist()
+    print("Top PageRank Results from Iteration")
+    for page, name in zip(top, page_names(path, top)):
+        print(f"  {name}: {ranks[page]:.4f}")
+
+
+def edge_directory(directory, block=BLOCK):
+    """
+    Returns the edge directory of the corpus in `directory`, building
+    it first if it is missing or any page has changed since.
+    """
+    path = os.path.join(directory, EDGES)
+    sources = _fingerprint(directory)
+    try:
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        meta = {}
+    if meta.get("version") != VERSION or meta.get("sources") != sources:
+        build_edges(directory, path, block)
+    return path
+
+
+def build_edges(directory, path, block=BLOCK):
+    """
+    Parses the HTML pages in `directory` into edge files in `path`,
+    holding about `block` edges, links or page names in memory at a time.
+
+    Page names are sorted in runs of `block` and merged into pages.txt,
+    which numbers them. Each page's links are then written out as (target
+    name, source page) pairs in sorted runs. Merging those runs while
+    reading pages.txt alongside finds each target's number, and since
+    pages are numbered in name order, the edges come out sorted by target
+    and then source, ready to write.
+    """
+    os.makedirs(path, exist_ok=True)
+    pages_path = os.path.join(path, "pages.txt")
+    with os.scandir(directory) as scan:
+        runs = _sorted_runs(path, "names", (
+            (entry.name,) for entry in scan if entry.name.endswith(".html")
+        ), block)
+    count = 0
+    with open(pages_path, "w", encoding="utf-8",
+              errors="surrogateescape") as f:
+        for name, in heapq.merge(*map(_read_run, runs)):
+            f.write(f"{name}\n")
+            count += 1
+    _remove(runs)
+
+    runs = _sorted_runs(path, "links", _links(directory, pages_path), block)
+    degrees = np.memmap(os.path.join(path, "degrees.bin"), dtype=np.int32,
+                        mode="w+", shape=(max(count, 1),))
+    edges = 0
+    sources, targets = array("i"), array("i")
+    with open(pages_path, encoding="utf-8", errors="surrogateescape") as f, \
+            open(os.path.join(path, "edges.bin"), "wb") as out:
+        pages = enumerate(line.rstrip("\n") for line in f)
+        target, page = next(pages, (None, None))
+        previous = None
+        for name, source in heapq.merge(*map(_read_run, runs)):
+            while page is not None and page < name:
+                target, page = next(pages, (None, None))
+            # Links outside the corpus, to the page itself, or repeated
+            # are left out
+            if page != name or target == source or previous == (name, source):
+                continue
+            previous = name, source
+            sources.append(source)
+            targets.append(target)
+            if len(sources) >= block:
+                edges += _write_edges(out, degrees, sources, targets)
+                sources, targets = array("i"), array("i")
+        edges += _write_edges(out, degrees, sources, targets)
+    degrees.flush()
+    _remove(runs)
+
+    with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "version": VERSION,
+            "sources": _fingerprint(directory),
+            "pages": count,
+            "edges": edges,
+        }, f)
+
+
+def iterate_edges(path, damping_factor, tolerance, block=BLOCK,
+                  max_iterations=1000, stats=None):
+    """
+    Runs power iteration over the edge files in `path`, returning the
+    ranks as a memory-mapped array in page order.
+
+    Each sweep streams the edges in blocks of `block`. Edges are sorted
+    by target, so each block adds up the rank flowing into a run of
+    consecutive pages. Rank vectors live in files beside the edges, so
+    memory use is bounded by the block size, not the corpus. Gives the
+    same ranks as iterate_pagerank's default solver.
+    """
+    with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+        meta = json.load(f)
+    n, count = meta["pages"], meta["edges"]
+    if not n:
+        return np.zeros(0)
+    degrees = np.memmap(os.path.join(path, "degrees.bin"), dtype=np.int32,
+                        mode="r", shape=(n,))
+    edges = _edges(os.path.join(path, "edges.bin"), count)
+
+    def vector(name):
+        return np.memmap(os.path.join(path, name), dtype=np.float64,
+                         mode="w+", shape=(n,))
+
+    ranks, updated, shares = vector("ranks.bin"), vector("next.bin"), \
+        vector("shares.bin")
+    ranks[:] = 1 / n
+    if stats is None:
+        stats = SolverStats()
+
+    for iteration in range(1, max_iterations + 1):
+        start = time.perf_counter()
+        # Each page splits its rank evenly over its links, while
+        # dangling pages and random jumps spread over every page
+        spread = 0
+        for first in range(0, n, block):
+            rank = ranks[first:first + block]
+            degree = degrees[first:first + block]
+            np.divide(rank, degree, out=shares[first:first + block],
+                      where=degree > 0)
+            shares[first:first + block][degree == 0] = 0
+            spread += (damping_factor * rank[degree == 0].sum()
+                       + (1 - damping_factor) * rank.sum())
+        updated[:] = spread / n
+
+        for first in range(0, count, block):
+            pairs = edges[first:first + block]
+            low, high = int(pairs[0, 1]), int(pairs[-1, 1]) + 1
+            updated[low:high] += damping_factor * np.bincount(
+                pairs[:, 1] - low, weights=shares[pairs[:, 0]],
+                minlength=high - low
+            )
+
+        change = sum(
+            np.abs(updated[first:first + block]
+                   - ranks[first:first + block]).sum()
+            for first in range(0, n, block)
+        )
+        ranks, updated = updated, ranks
+        stats.sweep(change, time.perf_counter() - start)
+        if change <= tolerance:
+            break
+
+    ranks.flush()
+    return ranks
+
+
+def top_pages(ranks, count, block=BLOCK):
+    """
+    Returns the numbers of the `count` highest-ranked pages, highest
+    first, reading `ranks` a block at a time.
+    """
+    best = np.zeros(0, dtype=np.int64)
+    for first in range(0, len(ranks), block):
+        candidates = np.concatenate([
+            best, np.arange(first, min(first + block, len(ranks)))
+        ])
+        best = candidates[np.argsort(-ranks[candidates],
+                                     kind="stable")[:count]]
+    return best
+
+
+def page_names(path, numbers):
+    """
+    Returns the names of the pages numbered `numbers` in the edge files
+    in `path`, reading through the page list once.
+    """
+    wanted = set(numbers)
+    found = {}
+    with open(os.path.join(path, "pages.txt"), encoding="utf-8",
+              errors="surrogateescape") as f:
+        for number, line in enumerate(f):
+            if number in wanted:
+                found[number] = line.rstrip("\n")
+    return [found[number] for number in numbers]
+
+
+def _links(directory, pages_path):
+    """
+    Yields a (target name, source page) pair for each link out of each
+    page in pages.txt, reading CHUNK pages at a time.
+    """
+    with open(pages_path, encoding="utf-8", errors="surrogateescape") as f:
+        names = (line.rstrip("\n") for line in f)
+        first = 0
+        while chunk := list(itertools.islice(names, CHUNK)):
+            paths = [os.path.join(directory, name) for name in chunk]
+            for source, links in enumerate(extract_links(paths), first):
+                for link in links:
+                    # No page name holds either, and runs are split on them
+                    if "\t" not in link and "\n" not in link:
+                        yield link, source
+            first += len(chunk)
+
+
+def _sorted_runs(path, prefix, rows, block):
+    """
+    Writes `rows`, each a name followed by any page numbers, to files in
+    `path` in sorted runs of up to `block` rows, returning their paths.
+    """
+    runs = []
+    while chunk := list(itertools.islice(rows, block)):
+        run = os.path.join(path, f"{prefix}{len(runs)}.txt")
+        with open(run, "w", encoding="utf-8",
+                  errors="surrogateescape") as f:
+            for row in sorted(chunk):
+                f.write("\t".join(map(str, row)) + "\n")
+        runs.append(run)
+    return runs
+
+
+def _read_run(run):
+    """
+    Yields the rows of a run file written by _sorted_runs, in order.
+    """
+    with open(run, encoding="utf-8", errors="surrogateescape") as f:
+        for line in f:
+            name, *numbers = line.rstrip("\n").split("\t")
+            yield (name, *map(int, numbers))
+
+
+def _write_edges(out, degrees, sources, targets):
+    """
+    Appends (source, target) pairs to the edge file `out`, counting them
+    in each source's out-degree, and returns how many there were.
+    """
+    pairs = np.empty((len(sources), 2), dtype=np.int32)
+    pairs[:, 0] = np.frombuffer(sources, dtype=np.int32)
+    pairs[:, 1] = np.frombuffer(targets, dtype=np.int32)
+    out.write(pairs.tobytes())
+    np.add.at(degrees, pairs[:, 0], 1)
+    return len(pairs)
+
+
+def _remove(runs):
+    for run in runs:
+        os.remove(run)
+
+
+def _edges(path, count):
+    if not count:
+        return np.zeros((0, 2), dtype=np.int32)
+    return np.memmap(path, dtype=np.int32, mode="r", shape=(count, 2))
+
+
+def _fingerprint(directory):
+    """
+    Returns the number of pages in `directory` and a hash of each one's
+    name, modification time and size, as the crawler's cache keys them.
+    The hashes are added up, so the order pages are listed in does not
+    matter and only one is held at a time.
+    """
+    count = total = 0
+    with os.scandir(directory) as scan:
+        for entry in scan:
+            if entry.name.endswith(".html"):
+                stat = entry.stat()
+                key = f"{entry.name}\0{stat.st_mtime_ns}\0{stat.st_size}"
+                digest = hashlib.blake2b(
+                    key.encode("utf-8", "surrogateescape"), digest_size=16
+                ).digest()
+                total = (total + int.from_bytes(digest, "little")) % (1 << 128)
+                count += 1
+    return [count, f"{total:032x}"]
+
+
+if __name__ == "__main__":
+    main()
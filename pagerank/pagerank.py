@@ -1,10 +1,15 @@
-import os
 import random
-import re
 import sys
 
+import numpy as np
+
+from crawler import crawl_index
+from matrix import SOLVERS, LinkMatrix, personalized_iteration, \
+    power_iteration, push_iteration, random_walk
+
 DAMPING = 0.85
 SAMPLES = 10000
+TOLERANCE = 1e-6
 
 
 def main():
@@ -27,25 +32,13 @@ def crawl(directory):
     Return a dictionary where each key is a page, and values are
     a list of all other pages in the corpus that are linked to by the page.
     """
-    pages = dict()
-
-    # Extract all links from HTML files
-    for filename in os.listdir(directory):
-        if not filename.endswith(".html"):
-            continue
-        with open(os.path.join(directory, filename)) as f:
-            contents = f.read()
-            links = re.findall(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"", contents)
-            pages[filename] = set(links) - {filename}
-
-    # Only include links to other pages in the corpus
-    for filename in pages:
-        pages[filename] = set(
-            link for link in pages[filename]
-            if link in pages
-        )
-
-    return pages
+    # Pages are read in parallel, and links are cached between runs
+    pages, offsets, targets = crawl_index(directory)
+    offsets, targets = offsets.tolist(), targets.tolist()
+    return {
+        page: set(pages[link] for link in targets[offsets[i]:offsets[i + 1]])
+        for i, page in enumerate(pages)
+    }
 
 
 def transition_model(corpus, page, damping_factor):
@@ -90,34 +83,17 @@ def sample_pagerank(corpus, damping_factor, n):
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
     """
-    currentPage = [random.choice(list(corpus.keys()))]
-
-    transitions = {}  # Dictionary of pages to keep track of times pages visited
-    for page in corpus.keys():
-        transitions[page] = 0
-
-    for i in range(n):
-        currentTransitionModel = transition_model(corpus, currentPage[0], DAMPING)
-
-        currentPage = random.choices(list(currentTransitionModel.keys()), weights=list(currentTransitionModel.values()))
+    # Walk over precomputed link arrays rather than building the
+    # transition model for every step. Seeding the walk from `random`
+    # keeps results reproducible with random.seed.
+    matrix = LinkMatrix.from_corpus(corpus)
+    rng = np.random.default_rng(random.getrandbits(64))
+    visits = random_walk(matrix, damping_factor, n, rng)
+    return matrix.as_dict(visits / n)
 
-        transitions[currentPage[0]] += 1
 
-    N = sum(transitions.values())
-
-    for page in transitions:
-        transitions[page] /= N
-
-    return transitions
-    # COMMENTED THIS OUT DUE TO FLOATING POINT IMPRECISION
-    # if sum(transitions.values()) == 1:
-    #     return transitions
-    # else:
-    #     print("SUM OF TRANSITION VALUES,", sum(transitions.values()))
-    #     raise ValueError("<<sample pagerank function>>\n PR values dont add up to one")
-
-
-def iterate_pagerank(corpus, damping_factor):
+def iterate_pagerank(corpus, damping_factor, tolerance=TOLERANCE,
+                     solver="jacobi", stats=None):
     """
     Return PageRank values for each page by iteratively updating
     PageRank values until convergence.
@@ -125,49 +101,91 @@ def iterate_pagerank(corpus, damping_factor):
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
+
+    Iteration stops once a sweep moves the values by at most
+    `tolerance` in L1 norm. `solver` picks the method from
+    matrix.SOLVERS: "jacobi", "gauss-seidel" or "anderson", raising
+    ValueError for any other name. Pass a SolverStats as `stats` to read
+    back the iterations, residuals and time per sweep.
     """
     # FORMULA
     # PR = (1-d)/N + d*E
     # E = i{ PR/NumLinks  }
-
-    # Setting values for ease of use
-    d = damping_factor
-    N = len(corpus)
-
-    # Initializing PageRanks
-    PageRanks = {x: (1/N) for x in corpus.keys()}
-
-    while True:
-        differenceFlag = False
-
-        # Loop over each page
-        for currentPage in PageRanks:
-            sigma = 0
-            # Loop over all pages
-            for incoming in corpus:
-                # If no links add to sigma
-                if not corpus[incoming]:
-                    sigma += PageRanks[incoming] / N
-
-                # If page links to current page add to sigma
-                if currentPage in corpus[incoming]:
-                    sigma += PageRanks[incoming] / len(corpus[incoming])
-
-            # Use formula
-            newPageRank = (1-d)/N + (d*sigma)
-
-            difference = PageRanks[currentPage] - newPageRank
-
-            PageRanks[currentPage] = newPageRank
-
-            # Set flag if any page rank changed by more than 0.001
-            if abs(difference) > 0.001:
-                differenceFlag = True
-
-        if not differenceFlag:
-            break
-
-    return PageRanks
+    # evaluated for every page at once as a sparse matrix product
+    if solver not in SOLVERS:
+        raise ValueError(f"unknown solver {solver!r}; choose from "
+                         f"{', '.join(sorted(SOLVERS))}")
+    matrix = LinkMatrix.from_corpus(corpus)
+    ranks, _ = SOLVERS[solver](matrix, damping_factor, tolerance,
+                               stats=stats)
+    return matrix.as_dict(ranks)
+
+
+def personalized_pagerank(corpus, seeds, damping_factor,
+                          tolerance=TOLERANCE):
+    """
+    Return personalized PageRank values for each set of pages in
+    `seeds`: those of a surfer whose random jumps only land on pages in
+    that set.
+
+    Return a list with a dictionary for each set, where keys are page
+    names and values are PageRank values (between 0 and 1) that sum
+    to 1. All the sets are computed together in one batch. Raises
+    ValueError if a set is empty or has a page not in `corpus`.
+    """
+    matrix = LinkMatrix.from_corpus(corpus)
+    for pages in seeds:
+        for page in pages:
+            if page not in matrix.index:
+                raise ValueError(f"seed page {page} is not in the corpus")
+    ranks, _ = personalized_iteration(
+        matrix, [[matrix.index[page] for page in pages] for pages in seeds],
+        damping_factor, tolerance
+    )
+    return [matrix.as_dict(column) for column in ranks.T]
+
+
+def update_pagerank(corpus, ranks, changes, damping_factor,
+                    tolerance=TOLERANCE, push=False):
+    """
+    Return PageRank values for each page after applying `changes` to
+    `corpus`, starting from the previous values `ranks` rather than
+    from scratch.
+
+    `changes` maps each added or edited page to the set of pages it now
+    links to, or to None if it was removed. `corpus` is updated in
+    place, keeping only links to other pages in the corpus, as `crawl`
+    does. With `push`, only pages whose values are off are updated,
+    which is quicker when the changes are few.
+    """
+    removed = set()
+    for page, links in changes.items():
+        if links is None:
+            corpus.pop(page, None)
+            removed.add(page)
+        else:
+            corpus[page] = set()
+    for page, links in changes.items():
+        if links is not None:
+            corpus[page] = set(
+                link for link in links if link in corpus and link != page
+            )
+    if removed:
+        for page, links in corpus.items():
+            if not links.isdisjoint(removed):
+                corpus[page] = links - removed
+
+    # Added pages start from an even share
+    matrix = LinkMatrix.from_corpus(corpus)
+    start = np.array([ranks.get(page, 1 / len(corpus))
+                      for page in matrix.pages])
+    start /= start.sum()
+    if push:
+        ranks, _ = push_iteration(matrix, damping_factor, start, tolerance)
+    else:
+        ranks, _ = power_iteration(matrix, damping_factor, tolerance,
+                                   ranks=start)
+    return matrix.as_dict(ranks)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,113 @@
+import os
+import random
+import shutil
+
+import numpy as np
+import pytest
+
+import outofcore
+import pagerank
+from matrix import SOLVERS
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+@pytest.fixture
+def corpus():
+    return pagerank.crawl(os.path.join(HERE, "corpus1"))
+
+
+def exact_pagerank(corpus, damping_factor):
+    """
+    Solves the PageRank equations directly, with dense linear algebra.
+    """
+    pages = sorted(corpus)
+    n = len(pages)
+    transitions = np.zeros((n, n))
+    for i, page in enumerate(pages):
+        links = corpus[page] or pages
+        for link in links:
+            transitions[pages.index(link), i] = 1 / len(links)
+    ranks = np.linalg.solve(np.eye(n) - damping_factor * transitions,
+                            np.full(n, (1 - damping_factor) / n))
+    return dict(zip(pages, ranks))
+
+
+@pytest.mark.parametrize("name", ["corpus0", "corpus1", "corpus2"])
+@pytest.mark.parametrize("solver", sorted(SOLVERS))
+def test_solvers(name, solver):
+    corpus = pagerank.crawl(os.path.join(HERE, name))
+    exact = exact_pagerank(corpus, pagerank.DAMPING)
+    ranks = pagerank.iterate_pagerank(corpus, pagerank.DAMPING, 1e-12,
+                                      solver=solver)
+    for page in exact:
+        assert ranks[page] == pytest.approx(exact[page], abs=1e-9)
+
+
+def test_unknown_solver(corpus):
+    with pytest.raises(ValueError, match="jacobi"):
+        pagerank.iterate_pagerank(corpus, pagerank.DAMPING,
+                                  solver="newton")
+
+
+def test_sampling_without_random_jumps(corpus):
+    # With no dangling pages, every link is followed and the walk never
+    # jumps, but it still has to stop after n samples
+    random.seed(0)
+    ranks = pagerank.sample_pagerank(corpus, 1.0, 1000)
+    assert sum(ranks.values()) == pytest.approx(1)
+
+
+@pytest.mark.parametrize("push", [False, True])
+def test_update_after_changes(corpus, push):
+    ranks = pagerank.iterate_pagerank(corpus, pagerank.DAMPING, 1e-12)
+    changes = {
+        "bfs.html": {"games.html"},
+        "new.html": {"bfs.html", "dfs.html"},
+        "minimax.html": None,
+    }
+    updated = pagerank.update_pagerank(corpus, ranks, changes,
+                                       pagerank.DAMPING, 1e-12, push=push)
+    exact = pagerank.iterate_pagerank(corpus, pagerank.DAMPING, 1e-12)
+    assert updated.keys() == exact.keys()
+    for page in exact:
+        assert updated[page] == pytest.approx(exact[page], abs=1e-9)
+
+
+def test_personalized(corpus):
+    ranks = pagerank.personalized_pagerank(
+        corpus, [set(corpus), {"bfs.html"}], pagerank.DAMPING, 1e-12
+    )
+    exact = pagerank.iterate_pagerank(corpus, pagerank.DAMPING, 1e-12)
+    for page in exact:
+        assert ranks[0][page] == pytest.approx(exact[page], abs=1e-9)
+    assert sum(ranks[1].values()) == pytest.approx(1)
+    assert ranks[1]["bfs.html"] > exact["bfs.html"]
+
+
+@pytest.mark.parametrize("seeds", [[set()], [{"missing.html"}]])
+def test_personalized_bad_seeds(corpus, seeds):
+    with pytest.raises(ValueError):
+        pagerank.personalized_pagerank(corpus, seeds, pagerank.DAMPING)
+
+
+@pytest.mark.parametrize("name", ["corpus0", "corpus1", "corpus2"])
+def test_outofcore(tmp_path, name):
+    directory = tmp_path / name
+    shutil.copytree(os.path.join(HERE, name), directory)
+    # A tiny block splits every step into several runs or blocks
+    path = outofcore.edge_directory(str(directory), block=3)
+    ranks = outofcore.iterate_edges(path, pagerank.DAMPING, 1e-12, block=3)
+    exact = pagerank.iterate_pagerank(pagerank.crawl(str(directory)),
+                                      pagerank.DAMPING, 1e-12)
+    names = outofcore.page_names(path, range(len(ranks)))
+    assert names == sorted(exact)
+    for number, page in enumerate(names):
+        assert ranks[number] == pytest.approx(exact[page], abs=1e-9)
+    top = outofcore.top_pages(ranks, 2, block=3).tolist()
+    assert top == sorted(range(len(ranks)), key=lambda i: -ranks[i])[:2]
+
+
+def test_outofcore_empty(tmp_path):
+    path = outofcore.edge_directory(str(tmp_path), block=3)
+    assert len(outofcore.iterate_edges(path, pagerank.DAMPING, 1e-12)) == 0
@@ -0,0 +1,111 @@
+import argparse
+import multiprocessing
+import os
+import time
+
+import numpy as np
+
+from crawler import crawl_matrix
+from matrix import LinkMatrix, power_iteration, random_walk
+from pagerank import DAMPING
+
+# The link matrix being sampled, set before the pool forks so every
+# worker shares it copy-on-write
+matrix = None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Estimate PageRank with many random walkers in "
+                    "parallel, reporting the error against the "
+                    "iterative solution as samples accumulate."
+    )
+    parser.add_argument("corpus")
+    parser.add_argument("--samples", type=int, default=1000000,
+                        help="total number of samples over all walkers")
+    parser.add_argument("--walkers", type=int, default=os.cpu_count(),
+                        help="number of independent walkers")
+    parser.add_argument("--processes", type=int, default=os.cpu_count(),
+                        help="number of worker processes")
+    parser.add_argument("--rounds", type=int, default=10,
+                        help="how many times to report progress")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    global matrix
+    matrix = crawl_matrix(args.corpus)
+    exact, _ = power_iteration(matrix, DAMPING, 1e-12)
+
+    print(f"{'samples':>12} {'L1 error':>12} {'max error':>12} "
+          f"{'seconds':>9}")
+    start = time.perf_counter()
+    for samples, visits in sample_parallel(DAMPING, args.samples,
+                                           args.walkers, args.processes,
+                                           args.rounds, args.seed):
+        error = np.abs(visits / samples - exact)
+        print(f"{samples:12d} {error.sum():12.6f} {error.max():12.6f} "
+              f"{time.perf_counter() - start:9.3f}")
+
+
+def parallel_sample_pagerank(corpus, damping_factor, n, walkers=None,
+                             seed=None):
+    """
+    Return PageRank values for each page by merging the visits of
+    `walkers` independent random walks of `n` samples in total, run
+    in parallel.
+
+    Return a dictionary where keys are page names, and values are
+    their estimated PageRank value (a value between 0 and 1). All
+    PageRank values should sum to 1.
+    """
+    global matrix
+    matrix = LinkMatrix.from_corpus(corpus)
+    walkers = walkers or os.cpu_count()
+    for _, visits in sample_parallel(damping_factor, n, walkers, walkers,
+                                     1, seed):
+        pass
+    return matrix.as_dict(visits / n)
+
+
+def sample_parallel(damping_factor, n, walkers, processes, rounds, seed):
+    """
+    Walks `matrix` with `walkers` walkers across a pool of `processes`
+    processes, yielding (samples so far, merged visit counts) after
+    each of `rounds` rounds that together take `n` samples.
+
+    Every walker draws from its own stream, spawned from `seed` for
+    each round, so results do not depend on how the pool schedules
+    the work.
+    """
+    seeds = np.random.SeedSequence(seed).spawn(walkers)
+    streams = [walker.spawn(rounds) for walker in seeds]
+    visits = np.zeros(len(matrix), dtype=np.int64)
+    samples = 0
+
+    context = multiprocessing.get_context("fork")
+    with context.Pool(min(processes, walkers)) as pool:
+        for number in range(rounds):
+            steps = n * (number + 1) // rounds - samples
+            tasks = [
+                (streams[walker][number],
+                 steps * (walker + 1) // walkers - steps * walker // walkers,
+                 damping_factor)
+                for walker in range(walkers)
+            ]
+            for counts in pool.imap_unordered(walk, tasks):
+                visits += counts
+            samples += steps
+            yield samples, visits.copy()
+
+
+def walk(task):
+    """
+    Runs one walker for one round, returning its visit counts.
+    """
+    seed, steps, damping_factor = task
+    return random_walk(matrix, damping_factor, steps,
+                       np.random.default_rng(seed))
+
+
+if __name__ == "__main__":
+    main()